@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tareas de mantenimiento de la base de datos - Plataforma de Capacitación Inmobiliaria
+
+Uso:
+    python maintenance.py check-indexes
+    python maintenance.py ensure-indexes
+    python maintenance.py compact-progress-events
+    python maintenance.py reconcile-video-stats
+    python maintenance.py rebuild-user-summaries
+    python maintenance.py downsample-rollups
+    python maintenance.py rebuild-unique-viewers
+    python maintenance.py rebuild-top-videos
+    python maintenance.py rebuild-video-retention
+"""
+
+import sys
+import asyncio
+
+import server
+
+
+async def check_indexes():
+    """Mostrar índices faltantes, sin uso o no declarados en INDEX_REGISTRY"""
+    print("🔍 REVISIÓN DE ÍNDICES")
+    print("=" * 50)
+
+    report = await server.check_indexes()
+    for collection_name, details in report.items():
+        print(f"\n📋 {collection_name}")
+        print(f"   ❌ Faltantes: {', '.join(details['missing']) or 'ninguno'}")
+        print(f"   💤 Sin uso: {', '.join(details['unused']) or 'ninguno'}")
+        print(f"   ⚠️  No declarados: {', '.join(details['undeclared']) or 'ninguno'}")
+
+
+async def ensure_indexes():
+    """Crear los índices de INDEX_REGISTRY que todavía no existen"""
+    print("🔧 CREACIÓN DE ÍNDICES")
+    print("=" * 50)
+
+    report = await server.ensure_indexes()
+    for collection_name, details in report.items():
+        for name in details["created"]:
+            print(f"   ✅ {collection_name}.{name} creado")
+        for name in details["failed"]:
+            print(f"   ❌ {collection_name}.{name} falló (revisa el log)")
+    print("\n🎉 Índices sincronizados")
+
+
+async def compact_progress_events():
+    """Aplicar a video_progress los eventos pendientes del log de progreso"""
+    print("🗜️  COMPACTACIÓN DE EVENTOS DE PROGRESO")
+    print("=" * 50)
+
+    compacted = await server.compact_progress_events()
+    print(f"✅ {compacted} eventos aplicados")
+
+
+async def reconcile_video_stats():
+    """Recalcular video_stats a partir de video_progress"""
+    print("📊 RECONCILIACIÓN DE ESTADÍSTICAS DE VIDEOS")
+    print("=" * 50)
+
+    report = await server.reconcile_video_stats()
+    print(f"✅ {report['videos']} videos revisados")
+    print(f"🔧 {report['corrected']} corregidos, {report['removed']} eliminados")
+
+
+async def rebuild_user_summaries():
+    """Reconstruir user_summary para todos los usuarios a partir de video_progress"""
+    print("👥 RECONSTRUCCIÓN DE RESÚMENES DE USUARIO")
+    print("=" * 50)
+
+    rebuilt = await server.rebuild_user_summaries()
+    print(f"✅ {rebuilt} resúmenes reconstruidos")
+
+
+async def downsample_rollups():
+    """Agrupar en buckets mensuales los buckets diarios que superan la retención"""
+    print("🗓️  COMPACTACIÓN DE ROLLUPS DE ANALÍTICA")
+    print("=" * 50)
+
+    folded = await server.downsample_rollups()
+    print(f"✅ {folded} buckets mensuales actualizados")
+
+
+async def rebuild_unique_viewers():
+    """Recalcular los sketches de usuarios únicos a partir de video_progress"""
+    print("👁️  RECONSTRUCCIÓN DE USUARIOS ÚNICOS")
+    print("=" * 50)
+
+    rebuilt = await server.rebuild_viewer_sketches()
+    print(f"✅ {rebuilt} sketches reconstruidos")
+
+
+async def rebuild_top_videos():
+    """Recontar los videos más vistos a partir de video_progress"""
+    print("🏆 RECONSTRUCCIÓN DE VIDEOS MÁS VISTOS")
+    print("=" * 50)
+
+    rebuilt = await server.rebuild_top_video_sketches()
+    print(f"✅ {rebuilt} resúmenes reconstruidos")
+
+
+async def rebuild_video_retention():
+    """Recalcular las curvas de retención a partir de watched_segments"""
+    print("📉 RECONSTRUCCIÓN DE CURVAS DE RETENCIÓN")
+    print("=" * 50)
+
+    rebuilt = await server.rebuild_video_retention()
+    print(f"✅ {rebuilt} videos reconstruidos")
+
+
+COMMANDS = {
+    "check-indexes": check_indexes,
+    "ensure-indexes": ensure_indexes,
+    "compact-progress-events": compact_progress_events,
+    "reconcile-video-stats": reconcile_video_stats,
+    "rebuild-user-summaries": rebuild_user_summaries,
+    "downsample-rollups": downsample_rollups,
+    "rebuild-unique-viewers": rebuild_unique_viewers,
+    "rebuild-top-videos": rebuild_top_videos,
+    "rebuild-video-retention": rebuild_video_retention,
+}
+
+
+async def main(command_name):
+    server.client, server.db = await server.init_db()
+    if server.client is None:
+        print("❌ Se requiere una conexión real a MongoDB")
+        return
+    try:
+        await COMMANDS[command_name]()
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1]))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Query Benchmark
+Counts MongoDB round trips and times endpoint handlers directly against the database,
+comparing them with the query patterns they replaced
+
+Usage:
+    python query_benchmark.py [runs]
+"""
+
+import sys
+import time
+import asyncio
+import statistics
+from collections import Counter
+
+from pymongo import monitoring
+
+import server
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command sent to MongoDB, by command name"""
+
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def legacy_get_categories():
+    """The previous GET /api/categories: one videos query per category"""
+    categories = await server.db.categories.find().to_list(1000)
+    for category in categories:
+        category_videos = await server.db.videos.find({"categoryId": category["id"]}).to_list(1000)
+        category["videos"] = [server.Video(**video) for video in category_videos]
+    return [server.Category(**category) for category in categories]
+
+
+class QueryBenchmark:
+    def __init__(self, counter, runs=20):
+        self.counter = counter
+        self.runs = runs
+        self.results = {}
+
+    async def benchmark(self, name, handler):
+        """Run handler repeatedly and record round trips per call and latency"""
+        print(f"\n⏱️  Benchmarking {name}...")
+        await handler()
+
+        self.counter.commands.clear()
+        await handler()
+        round_trips = dict(self.counter.commands)
+
+        samples = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            await handler()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        result = {
+            "queries": sum(count for command, count in round_trips.items() if command != "getMore"),
+            "get_more": round_trips.get("getMore", 0),
+            "p50": statistics.median(samples),
+            "mean": statistics.mean(samples),
+        }
+        self.results[name] = result
+        print(f"✅ {name}: {result['queries']} queries + {result['get_more']} getMore, "
+              f"p50={result['p50']:.1f}ms mean={result['mean']:.1f}ms")
+        return result
+
+    def print_summary(self):
+        print("\n" + "=" * 60)
+        print("📊 QUERY BENCHMARK SUMMARY")
+        print("=" * 60)
+        for name, result in self.results.items():
+            print(f"{name:<30} {result['queries']:>4} queries {result['p50']:>8.1f}ms p50")
+
+
+async def main(runs):
+    counter = CommandCounter()
+    # Listeners registered globally apply to clients created afterwards
+    monitoring.register(counter)
+    server.client, server.db = await server.init_db()
+    if server.client is None:
+        print("❌ Se requiere una conexión real a MongoDB")
+        return
+    try:
+        benchmark = QueryBenchmark(counter, runs)
+        categories = await server.db.categories.count_documents({})
+        print(f"📋 {categories} categories")
+        await benchmark.benchmark("categories (1 + N queries)", legacy_get_categories)
+        await benchmark.benchmark("catalog rebuild (2 queries)", lambda: server.build_catalog(0))
+        await benchmark.benchmark("catalog (cached)", server.get_catalog)
+        benchmark.print_summary()
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
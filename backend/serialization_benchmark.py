@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Serialization Benchmark
+Per-item cost of building and serialising list responses from database documents,
+comparing a model per document re-validated through response_model with batch
+TypeAdapter validation and with model_construct. Pure CPU, no MongoDB needed
+
+Usage:
+    python serialization_benchmark.py [runs]
+"""
+
+import sys
+import time
+import uuid
+import asyncio
+import statistics
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import server
+
+SIZES = (1000, 10000)
+
+
+def video_document(i):
+    return {
+        "_id": ObjectId(), "id": str(uuid.uuid4()), "title": f"Video {i}", "description": "Descripción",
+        "thumbnail": "https://img.youtube.com/vi/x/maxresdefault.jpg", "duration": "15 min",
+        "video_type": "youtube", "youtubeId": "dQw4w9WgXcQ", "match": "95%", "difficulty": "Intermedio",
+        "rating": 4.5, "views": i, "releaseDate": "2024", "categoryId": str(i % 6 + 1),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def user_document(i):
+    return {
+        "_id": ObjectId(), "id": str(uuid.uuid4()), "email": f"user{i}@example.com", "password": "secret",
+        "name": f"Usuario {i}", "role": "user", "created_at": datetime.utcnow(),
+    }
+
+
+def progress_document(i):
+    return {
+        "_id": ObjectId(), "id": str(uuid.uuid4()), "user_email": "user@example.com", "video_id": str(uuid.uuid4()),
+        "progress_percentage": 42.5, "watch_time": i, "completed": False,
+        "last_watched": datetime.utcnow(), "created_at": datetime.utcnow(),
+    }
+
+
+def category_document(i):
+    # Ten embedded videos per category, so per-item cost covers the nested list
+    return {
+        "_id": ObjectId(), "id": str(i), "name": f"Categoría {i}", "icon": "Home",
+        "videos": [server.normalize_video(video_document(j)) for j in range(10)], "created_at": datetime.utcnow(),
+    }
+
+
+CASES = {
+    "videos": (server.Video, server.VIDEO_LIST, video_document),
+    "categories": (server.Category, server.CATEGORY_LIST, category_document),
+    "users": (server.User, server.USER_LIST, user_document),
+    "video progress": (server.VideoProgress, server.VIDEO_PROGRESS_LIST, progress_document),
+}
+
+
+class SerializationBenchmark:
+    def __init__(self, runs=5):
+        self.runs = runs
+        self.results = {}
+
+    async def benchmark(self, name, size, handler):
+        """Run handler repeatedly and record the median cost per item in microseconds"""
+        await handler()
+        samples = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            await handler()
+            samples.append(time.perf_counter() - start)
+        per_item = statistics.median(samples) / size * 1_000_000
+        self.results[(name, size)] = per_item
+        return per_item
+
+    async def run_case(self, name, model, adapter, make_document):
+        field = create_response_field(name=f"response_{name}", type_=List[model])
+        for size in SIZES:
+            documents = [make_document(i) for i in range(size)]
+            print(f"\n⏱️  {name} x {size}")
+
+            async def per_document_models():
+                # The previous path: a model per document, then FastAPI's response_model
+                # validation and jsonable encoding before rendering
+                content = await serialize_response(field=field, response_content=[model(**d) for d in documents])
+                return JSONResponse(content).body
+
+            async def type_adapter():
+                return adapter.dump_json(adapter.validate_python(documents))
+
+            async def model_construct():
+                # No validation at all: extra keys such as _id must be projected away first
+                return adapter.dump_json([model.model_construct(**{k: v for k, v in d.items() if k != "_id"})
+                                          for d in documents])
+
+            handlers = [("models + response_model", per_document_models), ("TypeAdapter batch", type_adapter)]
+            # model_construct doesn't build nested models, so it only applies to flat documents
+            if name != "categories":
+                handlers.append(("model_construct", model_construct))
+            for label, handler in handlers:
+                per_item = await self.benchmark(f"{name}: {label}", size, handler)
+                print(f"   {label:<26} {per_item:>8.2f} µs/item")
+
+    def print_summary(self):
+        print("\n" + "=" * 60)
+        print("📊 SERIALIZATION BENCHMARK SUMMARY (µs per item)")
+        print("=" * 60)
+        for (name, size), per_item in self.results.items():
+            print(f"{name:<45} {size:>6} {per_item:>8.2f}")
+
+
+async def main(runs):
+    benchmark = SerializationBenchmark(runs)
+    for name, (model, adapter, make_document) in CASES.items():
+        await benchmark.run_case(name, model, adapter, make_document)
+    benchmark.print_summary()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -1,16 +1,32 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Form, WebSocket, WebSocketDisconnect, Request, Response, Query
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReplaceOne, DeleteOne, ReturnDocument, IndexModel, ASCENDING, DESCENDING
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError, TypeAdapter
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import hashlib
 import base64
+import asyncio
+import json
+import csv
+import io
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Optional: without it cached responses are offered gzip-compressed only
+    brotli = None
+
+from analytics import get_progress_analytics
+from sketches import HyperLogLog, SpaceSaving, DDSketch
 
 
 ROOT_DIR = Path(__file__).parent
@@ -23,6 +39,133 @@ app = FastAPI(title="Real Estate Training Platform API", version="1.0.0")
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 db_name = os.environ.get('DB_NAME', 'real_estate_training')
 
+# Upper bound for events accepted by POST /api/video-progress/batch
+MAX_PROGRESS_BATCH_SIZE = int(os.environ.get('MAX_PROGRESS_BATCH_SIZE', '500'))
+ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
+# Append-only progress event log; when enabled heartbeats are appended and folded by the compactor
+PROGRESS_EVENT_LOG = os.environ.get('PROGRESS_EVENT_LOG', 'false').lower() == 'true'
+PROGRESS_EVENTS_TIMESERIES = os.environ.get('PROGRESS_EVENTS_TIMESERIES', 'false').lower() == 'true'
+PROGRESS_EVENTS_RETENTION_DAYS = int(os.environ.get('PROGRESS_EVENTS_RETENTION_DAYS', '180'))
+PROGRESS_COMPACTION_INTERVAL_SECONDS = int(os.environ.get('PROGRESS_COMPACTION_INTERVAL_SECONDS', '5'))
+# Events younger than this are left for the next pass so in-flight inserts are not skipped
+PROGRESS_COMPACTION_SETTLE_SECONDS = int(os.environ.get('PROGRESS_COMPACTION_SETTLE_SECONDS', '2'))
+PROGRESS_COMPACTION_BATCH_SIZE = 1000
+# Concurrent per-row writes when applying a batch of progress events
+PROGRESS_WRITE_CONCURRENCY = 50
+# How often a /api/ws/progress connection flushes its buffered position
+WS_PROGRESS_FLUSH_SECONDS = float(os.environ.get('WS_PROGRESS_FLUSH_SECONDS', '10'))
+# A connection buffering more distinct videos than this flushes early
+WS_PROGRESS_MAX_PENDING_VIDEOS = 100
+# video_stats is maintained incrementally; this job recomputes it to correct any drift
+VIDEO_STATS_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('VIDEO_STATS_RECONCILE_INTERVAL_SECONDS', '3600'))
+# user_summary is also maintained incrementally; this job rebuilds it from video_progress
+USER_SUMMARY_REBUILD_INTERVAL_SECONDS = int(os.environ.get('USER_SUMMARY_REBUILD_INTERVAL_SECONDS', '86400'))
+# Analytics rollups: hourly buckets expire, daily buckets are folded into monthly ones as they age
+ROLLUP_HOURLY_RETENTION_DAYS = int(os.environ.get('ROLLUP_HOURLY_RETENTION_DAYS', '14'))
+ROLLUP_DAILY_RETENTION_DAYS = int(os.environ.get('ROLLUP_DAILY_RETENTION_DAYS', '400'))
+ROLLUP_GRANULARITIES = ("hour", "day", "week", "month")
+ROLLUP_DIMENSIONS = ("video", "category", "user")
+# Unique-viewer sketches are updated in memory and merged into MongoDB on this cadence
+UNIQUE_VIEWERS_FLUSH_SECONDS = int(os.environ.get('UNIQUE_VIEWERS_FLUSH_SECONDS', '30'))
+# Daily unique-viewer sketches (4 KB each) expire after this many days; all-time ones are kept
+UNIQUE_VIEWERS_DAILY_RETENTION_DAYS = int(os.environ.get('UNIQUE_VIEWERS_DAILY_RETENTION_DAYS', '400'))
+# A rebuild writes its sketches whenever this many are held in memory
+UNIQUE_VIEWERS_REBUILD_BATCH_SKETCHES = 2000
+# Most-watched tracking keeps this many Space-Saving counters per window, so K can go up to it
+TOP_VIDEOS_CAPACITY = int(os.environ.get('TOP_VIDEOS_CAPACITY', '100'))
+TOP_VIDEOS_WINDOWS = {"today": 1, "7d": 7, "all": None}
+# Heavy aggregates are recomputed in the background and served as snapshots
+# Catalog cache: other workers' catalog changes are picked up within this many seconds
+CATALOG_VERSION_POLL_SECONDS = float(os.environ.get('CATALOG_VERSION_POLL_SECONDS', '2'))
+ADMIN_STATS_REFRESH_SECONDS = int(os.environ.get('ADMIN_STATS_REFRESH_SECONDS', '60'))
+PROGRESS_ANALYTICS_REFRESH_SECONDS = int(os.environ.get('PROGRESS_ANALYTICS_REFRESH_SECONDS', '300'))
+# Audience retention: playback positions are recorded per fixed-size segment, up to a cap
+RETENTION_SEGMENT_SECONDS = int(os.environ.get('RETENTION_SEGMENT_SECONDS', '10'))
+RETENTION_MAX_SEGMENTS = int(os.environ.get('RETENTION_MAX_SEGMENTS', '2160'))
+
+# Indexes backing the hot-path queries, reconciled by ensure_indexes() at startup
+INDEX_REGISTRY = {
+    "videos": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Filtered keyset pages on GET /api/videos; categoryId also serves the catalog
+        # and per-category queries through its prefix
+        IndexModel([("categoryId", ASCENDING), ("id", ASCENDING)], name="categoryId_id"),
+        IndexModel([("difficulty", ASCENDING), ("id", ASCENDING)], name="difficulty_id"),
+        IndexModel([("video_type", ASCENDING), ("id", ASCENDING)], name="video_type_id"),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "video_progress": [
+        # Also serves the user_email-only queries through its prefix
+        IndexModel([("user_email", ASCENDING), ("video_id", ASCENDING)], name="user_email_video_id_unique", unique=True),
+        IndexModel([("video_id", ASCENDING)], name="video_id"),
+        # Keyset pagination of a user's history, newest first
+        IndexModel([("user_email", ASCENDING), ("last_watched", DESCENDING), ("id", DESCENDING)], name="user_email_last_watched_id"),
+        # Incremental exports scan by last_watched
+        IndexModel([("last_watched", ASCENDING), ("id", ASCENDING)], name="last_watched_id"),
+    ],
+    "video_chunks": [
+        IndexModel([("file_ref_id", ASCENDING), ("chunk_index", ASCENDING)], name="file_ref_id_chunk_index_unique", unique=True),
+    ],
+    "stats_snapshot_chunks": [
+        IndexModel(
+            [("snapshot", ASCENDING), ("computed_at", ASCENDING), ("chunk_index", ASCENDING)],
+            name="snapshot_computed_at_chunk_index_unique", unique=True
+        ),
+    ],
+    "video_stats": [
+        IndexModel([("video_id", ASCENDING)], name="video_id_unique", unique=True),
+    ],
+    "user_summary": [
+        IndexModel([("user_email", ASCENDING)], name="user_email_unique", unique=True),
+    ],
+    "analytics_rollups": [
+        IndexModel(
+            [("dimension", ASCENDING), ("granularity", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)],
+            name="dimension_granularity_key_bucket_unique", unique=True
+        ),
+        IndexModel([("dimension", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)], name="dimension_granularity_bucket"),
+        # Only hourly buckets carry expire_at
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+    "unique_viewer_sketches": [
+        IndexModel(
+            [("dimension", ASCENDING), ("granularity", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)],
+            name="dimension_granularity_key_bucket_unique", unique=True
+        ),
+        # Only daily sketches carry expire_at
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+    "top_video_sketches": [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket_unique", unique=True),
+        # Only daily sketches carry expire_at
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+    "watched_segments": [
+        IndexModel([("user_email", ASCENDING), ("video_id", ASCENDING)], name="user_email_video_id_unique", unique=True),
+        IndexModel([("video_id", ASCENDING)], name="video_id"),
+    ],
+    "video_retention": [
+        IndexModel([("video_id", ASCENDING)], name="video_id_unique", unique=True),
+    ],
+    "progress_events": [
+        IndexModel([("user_email", ASCENDING), ("video_id", ASCENDING), ("received_at", ASCENDING)], name="user_email_video_id_received_at"),
+    ],
+}
+if not PROGRESS_EVENTS_TIMESERIES:
+    # Time-series collections get their expiry at creation time instead
+    INDEX_REGISTRY["progress_events"].append(IndexModel(
+        [("received_at", ASCENDING)],
+        name="received_at_ttl",
+        expireAfterSeconds=PROGRESS_EVENTS_RETENTION_DAYS * 24 * 3600
+    ))
+
 async def init_db():
     try:
         client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
@@ -81,10 +224,63 @@ async def init_db():
         return None, InMemoryDB()
 
 client, db = None, None  # Initialize with None
+background_tasks = set()  # Keep references so background tasks are not garbage collected
+
+def start_background_task(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def run_periodically(name: str, interval_seconds: float, job):
+    """Run job() forever, logging failures instead of letting them kill the loop"""
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Background job {name} failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
+
 @app.on_event("startup")
 async def startup_db_client():
     global client, db
     client, db = await init_db()
+    if client is None:
+        return
+    if PROGRESS_EVENT_LOG:
+        await ensure_progress_events_collection()
+        start_background_task(run_periodically(
+            "progress compaction", PROGRESS_COMPACTION_INTERVAL_SECONDS, compact_progress_events
+        ))
+    if ENSURE_INDEXES_ON_STARTUP:
+        # Index builds can take a while on large collections, so don't block startup
+        start_background_task(ensure_indexes())
+    start_background_task(run_periodically(
+        "video stats reconciliation", VIDEO_STATS_RECONCILE_INTERVAL_SECONDS, reconcile_video_stats
+    ))
+    start_background_task(run_periodically(
+        "user summary rebuild", USER_SUMMARY_REBUILD_INTERVAL_SECONDS, rebuild_user_summaries
+    ))
+    start_background_task(run_periodically("rollup downsampling", 24 * 3600, downsample_rollups))
+    # Seed the sketches on an existing database before the first flush can create them
+    start_background_task(seed_once("unique_viewer_sketches", rebuild_viewer_sketches))
+    start_background_task(seed_once("top_video_sketches", rebuild_top_video_sketches))
+    start_background_task(run_periodically(
+        "unique viewer sketch flush", UNIQUE_VIEWERS_FLUSH_SECONDS, flush_viewer_sketches
+    ))
+    start_background_task(run_periodically(
+        "top video sketch flush", UNIQUE_VIEWERS_FLUSH_SECONDS, flush_top_video_sketches
+    ))
+    start_background_task(run_periodically(
+        "watched segment flush", UNIQUE_VIEWERS_FLUSH_SECONDS, flush_watched_segments
+    ))
+    start_background_task(run_periodically("cache version poll", CATALOG_VERSION_POLL_SECONDS, poll_cache_versions))
+    for name, (_, interval_seconds) in STATS_SNAPSHOTS.items():
+        start_background_task(run_periodically(
+            f"{name} snapshot", interval_seconds, lambda name=name: refresh_stale_snapshot(name)
+        ))
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -134,6 +330,9 @@ class Video(BaseModel):
     upload_date: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Only the fields the Video model serialises, so large or internal fields never leave MongoDB
+VIDEO_PROJECTION = {"_id": 0, **{field: 1 for field in Video.model_fields}}
+
 class VideoCreate(BaseModel):
     title: str
     description: Optional[str] = ""
@@ -241,6 +440,17 @@ class VideoProgress(BaseModel):
     last_watched: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Batch validators for list endpoints reading trusted documents: one validate_python call
+# builds the whole list and dump_json serialises it in a single pass, instead of a model
+# per document that FastAPI then re-validates and re-encodes through response_model
+VIDEO_LIST = TypeAdapter(List[Video])
+CATEGORY_LIST = TypeAdapter(List[Category])
+USER_LIST = TypeAdapter(List[User])
+VIDEO_PROGRESS_LIST = TypeAdapter(List[VideoProgress])
+
+def json_list_response(adapter: TypeAdapter, items: List[Any], headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=adapter.dump_json(items), media_type="application/json", headers=headers)
+
 class VideoProgressCreate(BaseModel):
     user_email: str
     video_id: str
@@ -253,12 +463,31 @@ class VideoProgressUpdate(BaseModel):
     watch_time: Optional[int] = None
     completed: Optional[bool] = None
 
+class VideoProgressBatch(BaseModel):
+    events: List[VideoProgressCreate]
+
+class ProgressFrame(BaseModel):
+    """Compact progress frame sent over /api/ws/progress"""
+    v: str  # video_id
+    p: Optional[float] = None  # progress_percentage
+    t: Optional[int] = None  # watch_time in seconds
+    c: Optional[bool] = None  # completed
+
 # Enhanced Video Model with statistics
 class VideoStats(BaseModel):
     total_views: int = 0
     total_completions: int = 0
     average_completion_rate: float = 0.0
     average_watch_time: int = 0
+    median_watch_time: int = 0
+    p90_watch_time: int = 0
+    p99_watch_time: int = 0
+    median_completion: float = 0.0
+    p90_completion: float = 0.0
+    p99_completion: float = 0.0
+
+class VideoStatsBatchRequest(BaseModel):
+    video_ids: List[str]
 
 class VideoWithStats(BaseModel):
     id: str
@@ -266,7 +495,7 @@ class VideoWithStats(BaseModel):
     description: str
     thumbnail: str
     duration: str
-    youtubeId: str
+    youtubeId: Optional[str] = None  # None for Vimeo and MP4 videos
     match: str
     difficulty: str
     rating: float
@@ -338,6 +567,283 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
 
 
+# Helper functions for monotonic progress merges
+def merge_progress_fields(current: Optional[Dict[str, Any]], incoming: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge two progress states in memory using the same rules as build_progress_merge"""
+    merged = dict(current or {})
+    for field in ("progress_percentage", "watch_time"):
+        if incoming.get(field) is not None:
+            merged[field] = max(merged.get(field, incoming[field]), incoming[field])
+    if incoming.get("completed") is not None:
+        merged["completed"] = bool(merged.get("completed")) or incoming["completed"]
+    if incoming.get("last_watched") is not None:
+        merged["last_watched"] = max(merged.get("last_watched", incoming["last_watched"]), incoming["last_watched"])
+    return merged
+
+def build_progress_merge(progress_fields: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Build an update document that only ever moves progress forward.
+
+    progress_percentage, watch_time and last_watched use $max and completed is
+    set-once, so out-of-order or concurrent heartbeats can be applied blindly
+    without reading the current document first.
+    """
+    maximums = {"last_watched": progress_fields.get("last_watched") or now}
+    for field in ("progress_percentage", "watch_time"):
+        if progress_fields.get(field) is not None:
+            maximums[field] = progress_fields[field]
+
+    update = {
+        "$max": maximums,
+        "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+    }
+    if progress_fields.get("completed"):
+        update["$set"] = {"completed": True}
+    else:
+        update["$setOnInsert"]["completed"] = False
+    # Fields absent from a partial update still need defaults on insert
+    for field, default in (("progress_percentage", 0.0), ("watch_time", 0)):
+        if field not in maximums:
+            update["$setOnInsert"][field] = default
+    return update
+
+def progress_after_merge(before: Optional[Dict[str, Any]], key: tuple, update: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a build_progress_merge update to the previous document in memory, mirroring MongoDB"""
+    after = dict(before) if before else {"user_email": key[0], "video_id": key[1], **update["$setOnInsert"]}
+    for field, value in update["$max"].items():
+        if after.get(field) is None or value > after[field]:
+            after[field] = value
+    after.update(update.get("$set", {}))
+    return after
+
+def progress_transition(before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> Tuple[int, int, int]:
+    """Return (new views, new completions, watch-time delta) caused by moving from before to after"""
+    new_view = 1 if before is None else 0
+    new_completion = 1 if after.get("completed") and not (before and before.get("completed")) else 0
+    watch_time_delta = (after.get("watch_time") or 0) - ((before or {}).get("watch_time") or 0)
+    return new_view, new_completion, watch_time_delta
+
+
+# Helper functions for index management
+def _index_key(key) -> tuple:
+    return tuple((field, direction) for field, direction in (key.items() if hasattr(key, "items") else key))
+
+async def ensure_indexes() -> Dict[str, Dict[str, List[str]]]:
+    """Create any registered index that is missing; failures are logged and reported, not raised"""
+    report = {}
+    for collection_name, index_models in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = {_index_key(info["key"]) for info in (await collection.index_information()).values()}
+        report[collection_name] = {"created": [], "failed": []}
+        for index_model in index_models:
+            spec = index_model.document
+            if _index_key(spec["key"]) in existing:
+                continue
+            try:
+                await collection.create_indexes([index_model])
+                report[collection_name]["created"].append(spec["name"])
+                logger.info(f"Created index {collection_name}.{spec['name']}")
+            except Exception as e:
+                # Typically a unique index over pre-existing duplicates; the app keeps working without it
+                report[collection_name]["failed"].append(spec["name"])
+                logger.error(f"Could not create index {collection_name}.{spec['name']}: {str(e)}")
+    return report
+
+async def check_indexes() -> Dict[str, Dict[str, List[str]]]:
+    """Report registered indexes that are missing and existing indexes that are never used"""
+    report = {}
+    for collection_name, index_models in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        existing_keys = {_index_key(info["key"]): name for name, info in existing.items()}
+        declared_keys = {_index_key(model.document["key"]) for model in index_models}
+
+        usage = {}
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                usage[stat["name"]] = stat["accesses"]["ops"]
+        except Exception as e:
+            logger.warning(f"$indexStats unavailable for {collection_name}: {str(e)}")
+
+        report[collection_name] = {
+            "missing": [model.document["name"] for model in index_models
+                        if _index_key(model.document["key"]) not in existing_keys],
+            "unused": [name for name, ops in usage.items() if ops == 0 and name != "_id_"],
+            "undeclared": [name for key, name in existing_keys.items()
+                           if key not in declared_keys and name != "_id_"],
+        }
+    return report
+
+
+# Helper functions for keyset pagination cursors
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode the sort key of the last returned item as an opaque cursor"""
+    payload = {k: v.isoformat() if isinstance(v, datetime) else v for k, v in values.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor: str, string_fields=(), datetime_fields=()) -> Dict[str, Any]:
+    """Decode a cursor, requiring each listed field with the expected type"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        for field in string_fields:
+            if not isinstance(values[field], str):
+                raise ValueError(field)
+        for field in datetime_fields:
+            values[field] = datetime.fromisoformat(values[field])
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+# Progress write path shared by the HTTP endpoints and the event-log compactor
+async def apply_progress_events(events: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+    """Merge progress events into video_progress, returning a status per user/video.
+
+    Each key is written with find_one_and_update returning the prior document, so the
+    transition fed to derived state is atomic with the write even when two batches
+    update the same row concurrently (two tabs, overlapping compaction passes)
+    """
+    merged_events = {}
+    for event in events:
+        key = (event["user_email"], event["video_id"])
+        merged_events[key] = merge_progress_fields(merged_events.get(key), event)
+
+    now = datetime.utcnow()
+    semaphore = asyncio.Semaphore(PROGRESS_WRITE_CONCURRENCY)
+
+    async def apply(key, event):
+        update = build_progress_merge(event, now)
+        async with semaphore:
+            before = await db.video_progress.find_one_and_update(
+                {"user_email": key[0], "video_id": key[1]},
+                update,
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        return before, progress_after_merge(before, key, update)
+
+    keys = list(merged_events)
+    results = await asyncio.gather(*(apply(key, merged_events[key]) for key in keys), return_exceptions=True)
+
+    statuses = {}
+    changes = []
+    for key, result in zip(keys, results):
+        if isinstance(result, Exception):
+            statuses[key] = {"status": "error", "detail": str(result)}
+            continue
+        statuses[key] = {"status": "created" if result[0] is None else "updated"}
+        changes.append(result)
+
+    await on_progress_changes(changes)
+    return statuses
+
+async def apply_progress_event(event: Dict[str, Any], upsert: bool = True) -> Optional[Dict[str, Any]]:
+    """Merge one progress event in a single round trip and return the resulting document"""
+    key = (event["user_email"], event["video_id"])
+    update = build_progress_merge(event, datetime.utcnow())
+    before = await db.video_progress.find_one_and_update(
+        {"user_email": key[0], "video_id": key[1]},
+        update,
+        upsert=upsert,
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None and not upsert:
+        return None
+    after = progress_after_merge(before, key, update)
+    await on_progress_changes([(before, after)])
+    return after
+
+async def on_progress_changes(changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]):
+    """Maintain state derived from progress, given (before, after) pairs; before is None for new rows"""
+    if not changes:
+        return
+    # Derived state is repaired by reconciliation, so never fail the progress write itself
+    try:
+        category_ids = await get_video_category_ids({after["video_id"] for _, after in changes})
+    except Exception as e:
+        logger.error(f"Error loading video categories for derived progress state: {str(e)}")
+        category_ids = {}
+    results = await asyncio.gather(
+        update_video_stats(changes),
+        update_user_summaries(changes, category_ids),
+        update_rollups(changes, category_ids),
+        record_unique_viewers(changes, category_ids),
+        record_top_videos(changes),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error updating derived progress state: {str(result)}")
+
+async def record_progress_events(events: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+    """Entry point for heartbeats: append to the event log when enabled, otherwise merge directly"""
+    record_watched_positions(events)
+    if PROGRESS_EVENT_LOG:
+        await append_progress_events(events)
+        return {(event["user_email"], event["video_id"]): {"status": "queued"} for event in events}
+    return await apply_progress_events(events)
+
+async def ensure_progress_events_collection():
+    """Create progress_events, as a time-series collection when configured"""
+    if not PROGRESS_EVENTS_TIMESERIES or "progress_events" in await db.list_collection_names():
+        return
+    try:
+        await db.create_collection(
+            "progress_events",
+            timeseries={"timeField": "received_at", "metaField": "video_id", "granularity": "seconds"},
+            expireAfterSeconds=PROGRESS_EVENTS_RETENTION_DAYS * 24 * 3600
+        )
+    except Exception as e:
+        # Older servers without time-series support fall back to a regular collection
+        logger.warning(f"Could not create time-series progress_events: {str(e)}")
+
+async def append_progress_events(events: List[Dict[str, Any]]):
+    """Append heartbeats to the progress event log"""
+    now = datetime.utcnow()
+    await db.progress_events.insert_many(
+        [{**event, "received_at": now} for event in events],
+        ordered=False
+    )
+
+async def compact_progress_events() -> int:
+    """Fold settled events past the watermark into video_progress.
+
+    Merges are idempotent, so a pass interrupted before the watermark moves
+    simply re-applies the same events next time. Events are never deleted
+    here; they expire through the retention policy.
+    """
+    state = await db.progress_compaction.find_one({"_id": "progress_events"})
+    watermark = state["watermark"] if state else datetime(1970, 1, 1)
+    cutoff = datetime.utcnow() - timedelta(seconds=PROGRESS_COMPACTION_SETTLE_SECONDS)
+    if cutoff <= watermark:
+        return 0
+
+    cursor = db.progress_events.find(
+        {"received_at": {"$gt": watermark, "$lte": cutoff}},
+        {"_id": 0, "user_email": 1, "video_id": 1, "progress_percentage": 1,
+         "watch_time": 1, "completed": 1, "received_at": 1}
+    ).batch_size(PROGRESS_COMPACTION_BATCH_SIZE)
+
+    compacted = 0
+    pending = []
+    async for event in cursor:
+        event["last_watched"] = event.pop("received_at")
+        pending.append(event)
+        if len(pending) >= PROGRESS_COMPACTION_BATCH_SIZE:
+            await apply_progress_events(pending)
+            compacted += len(pending)
+            pending = []
+    if pending:
+        await apply_progress_events(pending)
+        compacted += len(pending)
+
+    await db.progress_compaction.update_one(
+        {"_id": "progress_events"},
+        {"$set": {"watermark": cutoff, "last_run": datetime.utcnow(), "last_compacted": compacted}},
+        upsert=True
+    )
+    return compacted
+
+
 # Helper function to initialize default categories
 async def initialize_default_categories():
     default_categories = [
@@ -355,6 +861,127 @@ async def initialize_default_categories():
     for category_data in default_categories:
         category_obj = Category(**category_data, created_at=datetime.utcnow())
         await db.categories.insert_one(category_obj.dict())
+    await bump_cache_version("catalog")
+
+
+# Helper functions for versioned response caches. Every write to a cached resource
+# ("catalog" for videos and categories, "settings", "banner_video") bumps its counter in
+# catalog_state; a cache is rebuilt when it was built for an older version, so reads are
+# a dict lookup between changes
+cache_versions: Dict[str, int] = {}
+catalog_cache: Dict[str, Any] = {"version": None}
+catalog_lock = asyncio.Lock()
+response_caches: Dict[str, Dict[str, Any]] = {}
+response_cache_locks: Dict[str, asyncio.Lock] = {}
+
+async def bump_cache_version(name: str):
+    """Record a change: this worker's cache is invalidated at once, others' on their next poll"""
+    state = await db.catalog_state.find_one_and_update(
+        {"_id": name}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    cache_versions[name] = max(cache_versions.get(name, 0), state["version"])
+
+async def poll_cache_versions():
+    async for state in db.catalog_state.find({}, {"_id": 1, "version": 1}):
+        cache_versions[state["_id"]] = max(cache_versions.get(state["_id"], 0), state["version"])
+
+def normalize_video(video: Dict[str, Any]) -> Dict[str, Any]:
+    """Backward compatibility for videos stored before video_type and the source fields existed"""
+    if 'video_type' not in video or not video['video_type']:
+        video['video_type'] = 'youtube'  # Default to youtube for existing videos
+    for field in ('youtubeId', 'vimeoId', 'mp4_url', 'mp4_filename'):
+        video.setdefault(field, None)
+    return video
+
+async def build_catalog(version: int) -> Dict[str, Any]:
+    categories = await db.categories.find().to_list(1000)
+    if not categories:
+        # Initialize with default categories if none exist
+        await initialize_default_categories()
+        categories = await db.categories.find().to_list(1000)
+
+    videos = VIDEO_LIST.validate_python([normalize_video(video) async for video in db.videos.find({}, VIDEO_PROJECTION)])
+    videos_by_category = {category["id"]: [] for category in categories}
+    for video in videos:
+        category_videos = videos_by_category.get(video.categoryId)
+        if category_videos is not None and len(category_videos) < 1000:
+            category_videos.append(video)
+    catalog = {
+        "version": version,
+        "categories": CATEGORY_LIST.validate_python(
+            [{**category, "videos": videos_by_category[category["id"]]} for category in categories]
+        ),
+        "videos": videos[:1000],
+        "videos_by_id": {video.id: video for video in videos},
+    }
+    catalog["encoded"] = {
+        "categories": encode_json_variants(catalog["categories"], CATEGORY_LIST),
+        "videos": encode_json_variants(catalog["videos"], VIDEO_LIST),
+    }
+    return catalog
+
+def encode_json_variants(content, adapter: Optional[TypeAdapter] = None) -> Dict[str, Any]:
+    """Serialise once exactly as FastAPI would, plus compressed copies and a strong ETag of the bytes"""
+    body = adapter.dump_json(content) if adapter is not None else JSONResponse(jsonable_encoder(content)).body
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body)
+    return {"etag": hashlib.sha256(body).hexdigest()[:32], "bodies": bodies}
+
+def accepted_encodings(request: Request) -> set:
+    encodings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name.lower())
+    return encodings
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+def encoded_json_response(request: Request, encoded: Dict[str, Any]) -> Response:
+    """Raw pre-serialised body, compressed when the client accepts it, or 304 if the client's copy is current"""
+    accepted = accepted_encodings(request)
+    encoding = next((name for name in ("br", "gzip") if name in encoded["bodies"] and name in accepted), "identity")
+    # Each content-coding is a different representation, so it gets its own strong ETag
+    etag = f'"{encoded["etag"]}"' if encoding == "identity" else f'"{encoded["etag"]}-{encoding}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=encoded["bodies"][encoding], media_type="application/json", headers=headers)
+
+async def get_cached_response(name: str, build) -> Dict[str, Any]:
+    """Encoded response for a single cached resource, rebuilt with build() once per version"""
+    cached = response_caches.get(name)
+    if cached is not None and cached["version"] == cache_versions.get(name, 0):
+        return cached
+    lock = response_cache_locks.setdefault(name, asyncio.Lock())
+    async with lock:
+        cached = response_caches.get(name)
+        version = cache_versions.get(name, 0)
+        if cached is None or cached["version"] != version:
+            cached = {"version": version, **encode_json_variants(await build())}
+            response_caches[name] = cached
+    return cached
+
+async def get_catalog() -> Dict[str, Any]:
+    """The cached catalog, rebuilt at most once per version however many requests ask for it"""
+    global catalog_cache
+    if catalog_cache["version"] == cache_versions.get("catalog", 0):
+        return catalog_cache
+    async with catalog_lock:
+        version = cache_versions.get("catalog", 0)
+        if catalog_cache["version"] != version:
+            # Capture the version first, so a write during the rebuild triggers another one
+            catalog_cache = await build_catalog(version)
+    return catalog_cache
 
 
 # Authentication endpoints
@@ -380,38 +1007,137 @@ async def login_user(user_login: UserLogin):
 # Video Progress Tracking Endpoints
 @api_router.post("/video-progress", response_model=VideoProgress)
 async def create_or_update_video_progress(progress_data: VideoProgressCreate):
-    # Check if progress already exists for this user and video
-    existing_progress = await db.video_progress.find_one({
-        "user_email": progress_data.user_email,
-        "video_id": progress_data.video_id
-    })
-    
-    if existing_progress:
-        # Update existing progress
-        update_data = progress_data.dict()
-        update_data["last_watched"] = datetime.utcnow()
-        
-        await db.video_progress.update_one(
-            {"user_email": progress_data.user_email, "video_id": progress_data.video_id},
-            {"$set": update_data}
+    record_watched_positions([progress_data.dict()])
+    if PROGRESS_EVENT_LOG:
+        # The folded state becomes visible after the next compaction pass
+        event = progress_data.dict()
+        await append_progress_events([event])
+        return VideoProgress(**event)
+
+    # Merge server-side in one round trip so late heartbeats never move progress backwards
+    progress = await apply_progress_event(progress_data.dict())
+    return VideoProgress(**progress)
+
+@api_router.post("/video-progress/batch")
+async def create_or_update_video_progress_batch(batch: VideoProgressBatch):
+    """Apply many progress heartbeats, possibly across videos, with a single bulk write"""
+    if len(batch.events) > MAX_PROGRESS_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote excede el máximo de {MAX_PROGRESS_BATCH_SIZE} eventos"
         )
-        
-        # Return updated progress
-        updated_progress = await db.video_progress.find_one({
-            "user_email": progress_data.user_email,
-            "video_id": progress_data.video_id
-        })
-        return VideoProgress(**updated_progress)
-    else:
-        # Create new progress record
-        progress_obj = VideoProgress(**progress_data.dict())
-        await db.video_progress.insert_one(progress_obj.dict())
-        return progress_obj
+    if not batch.events:
+        return {"applied": 0, "results": []}
+
+    events = [event.dict() for event in batch.events]
+    statuses = await record_progress_events(events)
+
+    results = []
+    for index, event in enumerate(events):
+        item = {"index": index, "user_email": event["user_email"], "video_id": event["video_id"]}
+        item.update(statuses[(event["user_email"], event["video_id"])])
+        results.append(item)
+
+    applied = sum(1 for status in statuses.values() if status["status"] in ("created", "updated"))
+    return {"applied": applied, "results": results}
+
+@api_router.websocket("/ws/progress")
+async def progress_websocket(websocket: WebSocket, user_email: str):
+    """Long-lived progress channel for one viewing session.
+
+    The player streams frames such as {"v": "<video_id>", "p": 42.5, "t": 130}
+    and the server merges them in memory, writing through the regular progress
+    path every WS_PROGRESS_FLUSH_SECONDS and once more when the socket closes.
+    """
+    await websocket.accept()
+    pending = {}
+    flush_lock = asyncio.Lock()
+
+    async def flush():
+        nonlocal pending
+        # Serialised, so the final flush waits for a periodic one that is still writing
+        async with flush_lock:
+            if not pending:
+                return
+            buffered, pending = pending, {}
+            events = [{"user_email": user_email, "video_id": video_id, **fields} for video_id, fields in buffered.items()]
+            await record_progress_events(events)
+
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(WS_PROGRESS_FLUSH_SECONDS)
+            try:
+                # Shielded: cancelling the flusher at disconnect must not abort a write
+                # whose frames have already left `pending`
+                await asyncio.shield(flush())
+            except Exception as e:
+                logger.error(f"Error flushing progress for {user_email}: {str(e)}")
+
+    flusher = asyncio.create_task(flush_periodically())
+    try:
+        while True:
+            try:
+                frame = ProgressFrame(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError, KeyError):
+                # KeyError: binary frames have no text to decode
+                await websocket.send_json({"error": "Frame de progreso inválido"})
+                continue
+            fields = {"progress_percentage": frame.p, "watch_time": frame.t, "completed": frame.c}
+            # Every frame's position counts for retention, not just the merged maximum
+            record_watched_positions([{"user_email": user_email, "video_id": frame.v, **fields}])
+            if frame.v not in pending and len(pending) >= WS_PROGRESS_MAX_PENDING_VIDEOS:
+                await flush()
+            pending[frame.v] = merge_progress_fields(pending.get(frame.v), fields)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        flusher.cancel()
+        # Persist the final position of the session
+        await flush()
+
+@api_router.get("/video-progress/{user_email}/{video_id}/events")
+async def get_video_progress_events(user_email: str, video_id: str, limit: int = 500):
+    """Raw heartbeat history for one user and video, newest first"""
+    events = await db.progress_events.find(
+        {"user_email": user_email, "video_id": video_id},
+        {"_id": 0}
+    ).sort("received_at", -1).to_list(min(max(limit, 1), 5000))
+    return events
 
 @api_router.get("/video-progress/{user_email}")
-async def get_user_video_progress(user_email: str):
-    progress_list = await db.video_progress.find({"user_email": user_email}).to_list(1000)
-    return [VideoProgress(**progress) for progress in progress_list]
+async def get_user_video_progress(
+    user_email: str,
+    limit: int = Query(1000, ge=1, le=1000),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """User progress newest first, keyset-paginated on (last_watched, id).
+
+    JSON pages carry the cursor for the next page in the X-Next-Cursor header;
+    format=ndjson streams the whole remaining history in constant memory.
+    """
+    query = {"user_email": user_email}
+    if after:
+        position = decode_cursor(after, string_fields=("id",), datetime_fields=("last_watched",))
+        query["$or"] = [
+            {"last_watched": {"$lt": position["last_watched"]}},
+            {"last_watched": position["last_watched"], "id": {"$lt": position["id"]}}
+        ]
+    cursor = db.video_progress.find(query).sort([("last_watched", DESCENDING), ("id", DESCENDING)])
+
+    if format == "ndjson":
+        async def stream_progress():
+            async for progress in cursor.batch_size(500):
+                yield VideoProgress(**progress).json() + "\n"
+        return StreamingResponse(stream_progress(), media_type="application/x-ndjson")
+
+    progress_list = await cursor.limit(limit + 1).to_list(limit + 1)
+    headers = {}
+    if len(progress_list) > limit:
+        progress_list = progress_list[:limit]
+        last = progress_list[-1]
+        headers["X-Next-Cursor"] = encode_cursor({"last_watched": last["last_watched"], "id": last["id"]})
+    return json_list_response(VIDEO_PROGRESS_LIST, VIDEO_PROGRESS_LIST.validate_python(progress_list), headers)
 
 @api_router.get("/video-progress/{user_email}/{video_id}")
 async def get_video_progress(user_email: str, video_id: str):
@@ -426,85 +1152,793 @@ async def get_video_progress(user_email: str, video_id: str):
 @api_router.put("/video-progress/{user_email}/{video_id}")
 async def update_video_progress(user_email: str, video_id: str, progress_update: VideoProgressUpdate):
     update_data = {k: v for k, v in progress_update.dict().items() if v is not None}
-    update_data["last_watched"] = datetime.utcnow()
+    update_data.update({"user_email": user_email, "video_id": video_id})
     
-    result = await db.video_progress.update_one(
-        {"user_email": user_email, "video_id": video_id},
-        {"$set": update_data}
-    )
+    progress = await apply_progress_event(update_data, upsert=False)
     
-    if result.matched_count == 0:
+    if progress is None:
         raise HTTPException(status_code=404, detail="Progreso no encontrado")
     
     return {"message": "Progreso actualizado exitosamente"}
 
 @api_router.get("/dashboard/{user_email}")
 async def get_user_dashboard(user_email: str):
-    # Get all progress for user
-    progress_list = await db.video_progress.find({"user_email": user_email}).to_list(1000)
-    
-    # Calculate statistics
-    total_videos_watched = len(progress_list)
-    total_videos_completed = sum(1 for p in progress_list if p.get("completed", False))
-    total_watch_time = sum(p.get("watch_time", 0) for p in progress_list)
+    # Totals come from the materialised summary; recent videos and category sizes are small lookups
+    summary, recent, categories = await asyncio.gather(
+        db.user_summary.find_one({"user_email": user_email}),
+        db.video_progress.find({"user_email": user_email}, {"_id": 0, "video_id": 1})
+            .sort("last_watched", DESCENDING).limit(5).to_list(5),
+        get_categories_with_video_counts()
+    )
+    if summary is None and recent:
+        # First dashboard view for this user; the write path only updates existing summaries
+        await rebuild_user_summaries(user_email)
+        summary = await db.user_summary.find_one({"user_email": user_email})
+    summary = summary or {"watched": 0, "completed": 0, "watch_time": 0, "categories": {}}
+
+    total_videos_watched = summary["watched"]
+    total_videos_completed = summary["completed"]
     completion_rate = (total_videos_completed / total_videos_watched * 100) if total_videos_watched > 0 else 0
-    
-    # Get recent videos (last 5 watched)
-    recent_progress = sorted(progress_list, key=lambda x: x.get("last_watched", datetime.min), reverse=True)[:5]
-    recent_videos = []
-    
-    for progress in recent_progress:
-        video = await db.videos.find_one({"id": progress["video_id"]})
-        if video:
-            video_stats = await calculate_video_stats(progress["video_id"])
-            video_with_stats = VideoWithStats(**video, stats=video_stats)
-            recent_videos.append(video_with_stats)
-    
-    # Get progress by category
+
+    # Last 5 watched; entries whose video no longer exists are dropped
+    recent_ids = [progress["video_id"] for progress in recent]
+    videos_with_stats = await get_videos_with_stats(recent_ids)
+    recent_videos = [videos_with_stats[video_id] for video_id in recent_ids if video_id in videos_with_stats]
+
     progress_by_category = {}
-    categories = await db.categories.find().to_list(1000)
-    
     for category in categories:
-        category_videos = await db.videos.find({"categoryId": category["id"]}).to_list(1000)
-        category_video_ids = [v["id"] for v in category_videos]
-        
-        category_progress = [p for p in progress_list if p["video_id"] in category_video_ids]
-        watched_count = len(category_progress)
-        completed_count = sum(1 for p in category_progress if p.get("completed", False))
-        
+        category_progress = summary["categories"].get(category["id"], {})
+        watched_count = category_progress.get("watched", 0)
+        completed_count = category_progress.get("completed", 0)
+
         progress_by_category[category["name"]] = {
-            "total_videos": len(category_videos),
+            "total_videos": category["total_videos"],
             "watched_videos": watched_count,
             "completed_videos": completed_count,
             "completion_rate": (completed_count / watched_count * 100) if watched_count > 0 else 0
         }
-    
+
     return UserDashboard(
         user_email=user_email,
         total_videos_watched=total_videos_watched,
         total_videos_completed=total_videos_completed,
-        total_watch_time=total_watch_time,
+        total_watch_time=summary["watch_time"],
         completion_rate=completion_rate,
         recent_videos=recent_videos,
         progress_by_category=progress_by_category
     )
 
+# Helper function to list categories with the number of videos in each
+async def get_categories_with_video_counts() -> List[Dict[str, Any]]:
+    pipeline = [
+        {"$lookup": {
+            "from": "videos",
+            "localField": "id",
+            "foreignField": "categoryId",
+            "pipeline": [{"$project": {"_id": 1}}],
+            "as": "videos"
+        }},
+        {"$project": {"_id": 0, "id": 1, "name": 1, "total_videos": {"$size": "$videos"}}}
+    ]
+    return await db.categories.aggregate(pipeline).to_list(None)
+
 # Helper function to calculate video statistics
-async def calculate_video_stats(video_id: str) -> VideoStats:
-    progress_list = await db.video_progress.find({"video_id": video_id}).to_list(1000)
-    
-    total_views = len(progress_list)
-    total_completions = sum(1 for p in progress_list if p.get("completed", False))
-    average_completion_rate = (total_completions / total_views * 100) if total_views > 0 else 0
-    average_watch_time = sum(p.get("watch_time", 0) for p in progress_list) // total_views if total_views > 0 else 0
-    
+# $group stage producing the inputs of video_stats_from_group from video_progress rows
+VIDEO_STATS_GROUP_STAGE = {"$group": {
+    "_id": "$video_id",
+    "views": {"$sum": 1},
+    "completions": {"$sum": {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}},
+    "watch_time": {"$sum": {"$ifNull": ["$watch_time", 0]}}
+}}
+
+# Per-video distributions of watch time and progress percentage across viewers are kept
+# as DDSketch bucket counts inside video_stats, so percentiles cost one document read
+VIDEO_STATS_SKETCHES = {"watch_time_sketch": "watch_time", "progress_sketch": "progress_percentage"}
+
+def video_stats_sketch_deltas(before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> Dict[str, int]:
+    """$inc paths moving one viewer's values from their old sketch buckets to the new ones"""
+    deltas = {}
+    for sketch_field, progress_field in VIDEO_STATS_SKETCHES.items():
+        sketch = DDSketch()
+        new_key = sketch.key(after.get(progress_field) or 0)
+        old_key = sketch.key(before.get(progress_field) or 0) if before else None
+        if new_key != old_key:
+            deltas[f"{sketch_field}.{new_key}"] = 1
+            if old_key is not None:
+                deltas[f"{sketch_field}.{old_key}"] = -1
+    return deltas
+
+def video_stats_from_group(group: Optional[Dict[str, Any]]) -> VideoStats:
+    if not group or not group.get("views"):
+        return VideoStats()
+    watch_time = DDSketch(counts=group.get("watch_time_sketch"))
+    progress = DDSketch(counts=group.get("progress_sketch"))
     return VideoStats(
-        total_views=total_views,
-        total_completions=total_completions,
-        average_completion_rate=average_completion_rate,
-        average_watch_time=average_watch_time
+        total_views=group["views"],
+        total_completions=group["completions"],
+        average_completion_rate=group["completions"] / group["views"] * 100,
+        average_watch_time=group["watch_time"] // group["views"],
+        median_watch_time=round(watch_time.quantile(0.5)),
+        p90_watch_time=round(watch_time.quantile(0.9)),
+        p99_watch_time=round(watch_time.quantile(0.99)),
+        median_completion=round(progress.quantile(0.5), 2),
+        p90_completion=round(progress.quantile(0.9), 2),
+        p99_completion=round(progress.quantile(0.99), 2)
     )
 
+async def calculate_video_stats(video_id: str) -> VideoStats:
+    return (await calculate_video_stats_batch([video_id]))[video_id]
+
+async def calculate_video_stats_batch(video_ids: List[str]) -> Dict[str, VideoStats]:
+    """Stats for many videos with one $in on video_stats, plus one $group for any not reconciled yet"""
+    video_ids = list(dict.fromkeys(video_ids))
+    if not video_ids:
+        return {}
+    stats_by_id = {
+        stats["video_id"]: stats
+        async for stats in db.video_stats.find({"video_id": {"$in": video_ids}})
+    }
+    missing = [video_id for video_id in video_ids if video_id not in stats_by_id]
+    if missing:
+        # Data from before video_stats existed; computed from the source until reconciliation stores it
+        async for group in db.video_progress.aggregate([{"$match": {"video_id": {"$in": missing}}}, VIDEO_STATS_GROUP_STAGE]):
+            stats_by_id[group["_id"]] = group
+    return {video_id: video_stats_from_group(stats_by_id.get(video_id)) for video_id in video_ids}
+
+async def get_videos_with_stats(video_ids: List[str]) -> Dict[str, VideoWithStats]:
+    """Videos from the catalog cache with their stats from one batch query, keyed by video id"""
+    if not video_ids:
+        return {}
+    catalog, stats = await asyncio.gather(get_catalog(), calculate_video_stats_batch(video_ids))
+    videos = [catalog["videos_by_id"][video_id] for video_id in dict.fromkeys(video_ids) if video_id in catalog["videos_by_id"]]
+    return {video.id: VideoWithStats(**video.model_dump(), stats=stats[video.id]) for video in videos}
+
+async def update_video_stats(changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]):
+    """Apply the view, completion and watch-time deltas of progress changes to video_stats with $inc"""
+    deltas = {}
+    for before, after in changes:
+        new_view, new_completion, watch_time_delta = progress_transition(before, after)
+        delta = deltas.setdefault(after["video_id"], {"views": 0, "completions": 0, "watch_time": 0})
+        delta["views"] += new_view
+        delta["completions"] += new_completion
+        delta["watch_time"] += watch_time_delta
+        for path, value in video_stats_sketch_deltas(before, after).items():
+            delta[path] = delta.get(path, 0) + value
+
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"video_id": video_id}, {"$inc": delta, "$set": {"updated_at": now}}, upsert=True)
+        for video_id, delta in deltas.items()
+        if any(delta.values())
+    ]
+    if operations:
+        await db.video_stats.bulk_write(operations, ordered=False)
+
+async def reconcile_video_stats() -> Dict[str, int]:
+    """Recompute video_stats from video_progress, overwriting any drift"""
+    existing = {
+        stats["video_id"]: stats
+        async for stats in db.video_stats.find(
+            {}, {"_id": 0, "video_id": 1, "views": 1, "completions": 1, "watch_time": 1, **{field: 1 for field in VIDEO_STATS_SKETCHES}}
+        )
+    }
+    # Sketch buckets use Python's log, so they are counted here rather than in the pipeline
+    sketches = {}
+    progress = db.video_progress.find({}, {"_id": 0, "video_id": 1, **{field: 1 for field in VIDEO_STATS_SKETCHES.values()}})
+    async for p in progress.batch_size(5000):
+        video_sketches = sketches.setdefault(p["video_id"], {field: DDSketch() for field in VIDEO_STATS_SKETCHES})
+        for sketch_field, progress_field in VIDEO_STATS_SKETCHES.items():
+            video_sketches[sketch_field].add(p.get(progress_field) or 0)
+
+    now = datetime.utcnow()
+    operations = []
+    drifted = 0
+    seen = set()
+    async for group in db.video_progress.aggregate([VIDEO_STATS_GROUP_STAGE]):
+        video_id = group["_id"]
+        seen.add(video_id)
+        values = {"views": group["views"], "completions": group["completions"], "watch_time": group["watch_time"]}
+        for sketch_field, sketch in sketches.get(video_id, {}).items():
+            values[sketch_field] = sketch.counts
+        current = dict(existing.get(video_id, {}))
+        for sketch_field in VIDEO_STATS_SKETCHES:
+            # Buckets emptied by $inc stay behind with a count of 0
+            current[sketch_field] = {key: count for key, count in (current.get(sketch_field) or {}).items() if count}
+        if all(current.get(field) == value for field, value in values.items()):
+            continue
+        drifted += 1
+        operations.append(UpdateOne(
+            {"video_id": video_id},
+            {"$set": {**values, "updated_at": now, "reconciled_at": now}},
+            upsert=True
+        ))
+    stale = [video_id for video_id in existing if video_id not in seen]
+    if operations:
+        await db.video_stats.bulk_write(operations, ordered=False)
+    if stale:
+        await db.video_stats.delete_many({"video_id": {"$in": stale}})
+    if drifted or stale:
+        logger.warning(f"video_stats reconciliation corrected {drifted} videos and removed {len(stale)} stale entries")
+    return {"videos": len(seen), "corrected": drifted, "removed": len(stale)}
+
+# Helper functions for the materialised per-user dashboard summary
+async def get_video_category_ids(video_ids) -> Dict[str, str]:
+    videos_by_id = (await get_catalog())["videos_by_id"]
+    return {video_id: videos_by_id[video_id].categoryId for video_id in video_ids if video_id in videos_by_id}
+
+async def update_user_summaries(changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]], category_ids: Dict[str, str]):
+    """Apply progress transitions to each user's summary counters with $inc"""
+    deltas = {}
+    for before, after in changes:
+        new_view, new_completion, watch_time_delta = progress_transition(before, after)
+        delta = deltas.setdefault(after["user_email"], {})
+        for field, value in (("watched", new_view), ("completed", new_completion), ("watch_time", watch_time_delta)):
+            delta[field] = delta.get(field, 0) + value
+        # Only progress on existing videos counts towards a category, as on the dashboard
+        category_id = category_ids.get(after["video_id"])
+        if category_id is not None:
+            for field, value in (("watched", new_view), ("completed", new_completion)):
+                path = f"categories.{category_id}.{field}"
+                delta[path] = delta.get(path, 0) + value
+
+    now = datetime.utcnow()
+    # No upsert: a summary created from this delta alone would miss the user's earlier
+    # progress. Missing summaries are built from video_progress by the dashboard instead
+    operations = [
+        UpdateOne({"user_email": user_email}, {"$inc": delta, "$set": {"updated_at": now}})
+        for user_email, delta in deltas.items()
+        if any(delta.values())
+    ]
+    if operations:
+        await db.user_summary.bulk_write(operations, ordered=False)
+
+async def rebuild_user_summaries(user_email: Optional[str] = None) -> int:
+    """Recompute user_summary from video_progress for one user, or for everybody when user_email is None"""
+    pipeline = [{"$match": {"user_email": user_email}}] if user_email else []
+    pipeline += [
+        {"$lookup": {
+            "from": "videos",
+            "localField": "video_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 0, "categoryId": 1}}],
+            "as": "video"
+        }},
+        {"$unwind": {"path": "$video", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": {"user_email": "$user_email", "category_id": "$video.categoryId"},
+            "watched": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}},
+            "watch_time": {"$sum": {"$ifNull": ["$watch_time", 0]}}
+        }},
+        {"$sort": {"_id.user_email": 1}}
+    ]
+
+    now = datetime.utcnow()
+    summaries = {}
+    rebuilt = 0
+
+    async def flush():
+        nonlocal summaries, rebuilt
+        if summaries:
+            await db.user_summary.bulk_write([
+                ReplaceOne({"user_email": email}, summary, upsert=True) for email, summary in summaries.items()
+            ], ordered=False)
+            rebuilt += len(summaries)
+            summaries = {}
+
+    async for group in db.video_progress.aggregate(pipeline, allowDiskUse=True):
+        email = group["_id"]["user_email"]
+        if email not in summaries and len(summaries) >= 500:
+            await flush()
+        summary = summaries.setdefault(email, {
+            "user_email": email, "watched": 0, "completed": 0, "watch_time": 0, "categories": {}, "updated_at": now
+        })
+        summary["watched"] += group["watched"]
+        summary["completed"] += group["completed"]
+        summary["watch_time"] += group["watch_time"]
+        category_id = group["_id"].get("category_id")
+        if category_id is not None:
+            summary["categories"][category_id] = {"watched": group["watched"], "completed": group["completed"]}
+    await flush()
+
+    if user_email and rebuilt == 0:
+        # No progress left for this user
+        await db.user_summary.delete_one({"user_email": user_email})
+    return rebuilt
+
+async def remove_video_from_summaries(video_id: str, category_id: Optional[str]):
+    """Subtract a video's progress rows from the summaries of the users who watched it"""
+    operations = []
+    async for progress in db.video_progress.find({"video_id": video_id}, {"_id": 0, "user_email": 1, "completed": 1, "watch_time": 1}):
+        completed = 1 if progress.get("completed") else 0
+        delta = {"watched": -1, "completed": -completed, "watch_time": -(progress.get("watch_time") or 0)}
+        if category_id is not None:
+            delta[f"categories.{category_id}.watched"] = -1
+            delta[f"categories.{category_id}.completed"] = -completed
+        operations.append(UpdateOne({"user_email": progress["user_email"]}, {"$inc": delta}))
+    if operations:
+        await db.user_summary.bulk_write(operations, ordered=False)
+
+async def move_video_category_in_summaries(video_id: str, old_category_id: Optional[str], new_category_id: str):
+    """Move a video's watched/completed counters between categories in every affected summary"""
+    operations = []
+    async for progress in db.video_progress.find({"video_id": video_id}, {"_id": 0, "user_email": 1, "completed": 1}):
+        completed = 1 if progress.get("completed") else 0
+        delta = {f"categories.{new_category_id}.watched": 1, f"categories.{new_category_id}.completed": completed}
+        if old_category_id is not None:
+            delta[f"categories.{old_category_id}.watched"] = -1
+            delta[f"categories.{old_category_id}.completed"] = -completed
+        operations.append(UpdateOne({"user_email": progress["user_email"]}, {"$inc": delta}))
+    if operations:
+        await db.user_summary.bulk_write(operations, ordered=False)
+
+@api_router.post("/video-stats/batch")
+async def get_video_stats_batch(request: VideoStatsBatchRequest):
+    if len(request.video_ids) > 1000:
+        raise HTTPException(status_code=400, detail="Máximo 1000 videos por consulta")
+    return await calculate_video_stats_batch(request.video_ids)
+
+# Helper functions for time-bucketed analytics rollups
+def to_naive_utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; convert timezone-aware query parameters to match"""
+    if timestamp is None or timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+def rollup_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing timestamp"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+async def update_rollups(changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]], category_ids: Dict[str, str]):
+    """Add progress transitions to the hourly and daily buckets of their video, category and user"""
+    deltas = {}
+    for before, after in changes:
+        new_view, new_completion, watch_time_delta = progress_transition(before, after)
+        if not (new_view or new_completion or watch_time_delta):
+            continue
+        timestamp = after.get("last_watched") or datetime.utcnow()
+        keys = [("video", after["video_id"]), ("user", after["user_email"])]
+        if category_ids.get(after["video_id"]) is not None:
+            keys.append(("category", category_ids[after["video_id"]]))
+        for granularity in ("hour", "day"):
+            bucket = rollup_bucket(timestamp, granularity)
+            for dimension, key in keys:
+                delta = deltas.setdefault((dimension, granularity, key, bucket), {"views": 0, "completions": 0, "watch_time": 0})
+                delta["views"] += new_view
+                delta["completions"] += new_completion
+                delta["watch_time"] += watch_time_delta
+
+    operations = []
+    for (dimension, granularity, key, bucket), delta in deltas.items():
+        update = {"$inc": delta}
+        if granularity == "hour":
+            update["$setOnInsert"] = {"expire_at": bucket + timedelta(days=ROLLUP_HOURLY_RETENTION_DAYS)}
+        operations.append(UpdateOne(
+            {"dimension": dimension, "granularity": granularity, "key": key, "bucket": bucket},
+            update,
+            upsert=True
+        ))
+    if operations:
+        await db.analytics_rollups.bulk_write(operations, ordered=False)
+
+async def downsample_rollups() -> int:
+    """Fold daily buckets of months older than the daily retention into monthly buckets.
+
+    Each daily bucket is $set under its day in the monthly document rather than added to
+    a total, and deleted only if it still holds the values that were copied, so a crash
+    between the two steps, overlapping runs or a late $inc never double-count or drop data
+    """
+    cutoff = rollup_bucket(datetime.utcnow() - timedelta(days=ROLLUP_DAILY_RETENTION_DAYS), "month")
+    months = set()
+    folds = {}
+    deletes = []
+
+    async def flush():
+        nonlocal folds, deletes
+        if folds:
+            await db.analytics_rollups.bulk_write([
+                UpdateOne(
+                    {"dimension": dimension, "granularity": "month", "key": key, "bucket": bucket},
+                    {"$set": days},
+                    upsert=True
+                )
+                for (dimension, key, bucket), days in folds.items()
+            ], ordered=False)
+            await db.analytics_rollups.bulk_write(deletes, ordered=False)
+            folds, deletes = {}, []
+
+    async for daily in db.analytics_rollups.find(
+        {"granularity": "day", "bucket": {"$lt": cutoff}},
+        {"dimension": 1, "key": 1, "bucket": 1, "views": 1, "completions": 1, "watch_time": 1}
+    ):
+        totals = {field: daily.get(field, 0) for field in ("views", "completions", "watch_time")}
+        month = (daily["dimension"], daily["key"], rollup_bucket(daily["bucket"], "month"))
+        months.add(month)
+        folds.setdefault(month, {})[f"days.{daily['bucket'].day:02d}"] = totals
+        deletes.append(DeleteOne({"_id": daily["_id"], **totals}))
+        if len(deletes) >= 1000:
+            await flush()
+    await flush()
+    return len(months)
+
+def rollup_bucket_totals(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Counters stored in a rollup document: its own, or one per folded day for monthly buckets"""
+    return list(doc["days"].values()) if "days" in doc else [doc]
+
+async def query_rollups(dimension: str, granularity: str, start: datetime, end: datetime, key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Series of buckets in [start, end) for every key of a dimension, or for a single key"""
+    # Weeks are assembled from daily buckets; months also include already downsampled data
+    source_granularities = {"hour": ["hour"], "day": ["day"], "week": ["day"], "month": ["day", "month"]}[granularity]
+    query = {
+        "dimension": dimension,
+        "granularity": {"$in": source_granularities},
+        # Bounded by the requested bucket, so a monthly document (stored on the 1st) or
+        # the days of the first week are included when start falls inside them
+        "bucket": {"$gte": rollup_bucket(start, granularity), "$lt": end}
+    }
+    if key is not None:
+        query["key"] = key
+
+    series = {}
+    projection = {"_id": 0, "key": 1, "bucket": 1, "views": 1, "completions": 1, "watch_time": 1, "days": 1}
+    async for doc in db.analytics_rollups.find(query, projection):
+        buckets = series.setdefault(doc["key"], {})
+        bucket = rollup_bucket(doc["bucket"], granularity)
+        totals = buckets.setdefault(bucket, {"views": 0, "completions": 0, "watch_time": 0})
+        for counters in rollup_bucket_totals(doc):
+            for field in totals:
+                totals[field] += counters.get(field, 0)
+
+    labels = {}
+    if dimension == "category":
+        labels = {c["id"]: c["name"] async for c in db.categories.find({"id": {"$in": list(series)}}, {"_id": 0, "id": 1, "name": 1})}
+    elif dimension == "video":
+        labels = {v["id"]: v["title"] async for v in db.videos.find({"id": {"$in": list(series)}}, {"_id": 0, "id": 1, "title": 1})}
+
+    result = []
+    for series_key, buckets in series.items():
+        points = [{"bucket": bucket, **totals} for bucket, totals in sorted(buckets.items())]
+        result.append({
+            "key": series_key,
+            "label": labels.get(series_key, series_key),
+            "buckets": points,
+            "totals": {field: sum(point[field] for point in points) for field in ("views", "completions", "watch_time")}
+        })
+    result.sort(key=lambda item: item["totals"]["watch_time"], reverse=True)
+    return result
+
+# Helper functions for unique-viewer sketches. Each video and category has an all-time
+# HyperLogLog plus one per day of activity; daily sketches merge into the reach of any
+# date range
+pending_viewer_sketches: Dict[Tuple[str, str, str, Optional[datetime]], HyperLogLog] = {}
+
+async def seed_once(name: str, rebuild):
+    """Build derived state from video_progress the first time this database runs with it"""
+    try:
+        if await db.seed_markers.find_one({"_id": name}) is None:
+            await rebuild()
+    except Exception as e:
+        logger.error(f"Seeding {name} failed: {str(e)}")
+
+async def mark_seeded(name: str):
+    await db.seed_markers.update_one({"_id": name}, {"$set": {"seeded_at": datetime.utcnow()}}, upsert=True)
+
+def viewer_sketch_filter(dimension: str, granularity: str, key: str, bucket: Optional[datetime]) -> Dict[str, Any]:
+    return {"dimension": dimension, "granularity": granularity, "key": key, "bucket": bucket}
+
+async def record_unique_viewers(changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]], category_ids: Dict[str, str]):
+    """Add every viewer with progress activity to the in-memory sketches; re-adding a viewer is a no-op"""
+    for _, after in changes:
+        day = rollup_bucket(after.get("last_watched") or datetime.utcnow(), "day")
+        keys = [("video", after["video_id"])]
+        if category_ids.get(after["video_id"]) is not None:
+            keys.append(("category", category_ids[after["video_id"]]))
+        for dimension, key in keys:
+            for granularity, bucket in (("all", None), ("day", day)):
+                sketch = pending_viewer_sketches.setdefault((dimension, granularity, key, bucket), HyperLogLog())
+                sketch.add(after["user_email"])
+
+async def merge_viewer_sketches(sketches: Dict[Tuple[str, str, str, Optional[datetime]], HyperLogLog], since: Optional[datetime] = None):
+    """Union sketches into their stored counterparts; with since, older stored sketches are replaced instead"""
+    query = {"$or": [viewer_sketch_filter(*sketch_key) for sketch_key in sketches]}
+    if since is not None:
+        query["updated_at"] = {"$gte": since}
+    async for doc in db.unique_viewer_sketches.find(
+        query, {"_id": 0, "dimension": 1, "granularity": 1, "key": 1, "bucket": 1, "registers": 1}
+    ):
+        sketch_key = (doc["dimension"], doc["granularity"], doc["key"], doc["bucket"])
+        if sketch_key in sketches:
+            sketches[sketch_key].merge(HyperLogLog.from_bytes(doc["registers"]))
+
+    now = datetime.utcnow()
+    operations = []
+    for sketch_key, sketch in sketches.items():
+        fields = {"registers": sketch.to_bytes(), "updated_at": now}
+        if sketch_key[1] == "day":
+            fields["expire_at"] = sketch_key[3] + timedelta(days=UNIQUE_VIEWERS_DAILY_RETENTION_DAYS)
+        operations.append(UpdateOne(viewer_sketch_filter(*sketch_key), {"$set": fields}, upsert=True))
+    await db.unique_viewer_sketches.bulk_write(operations, ordered=False)
+
+async def flush_viewer_sketches() -> int:
+    """Merge pending sketches into their stored counterparts; merging is idempotent, so a failed flush is retried"""
+    global pending_viewer_sketches
+    pending, pending_viewer_sketches = pending_viewer_sketches, {}
+    if not pending:
+        return 0
+    try:
+        await merge_viewer_sketches(pending)
+    except Exception:
+        for sketch_key, sketch in pending.items():
+            pending_viewer_sketches.setdefault(sketch_key, HyperLogLog()).merge(sketch)
+        raise
+    return len(pending)
+
+async def estimate_unique_viewers(
+    dimension: str,
+    keys: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, int]:
+    """Estimated distinct viewers per key, all-time or over the days in [start, end)"""
+    query = {"dimension": dimension}
+    if start is None and end is None:
+        query["granularity"] = "all"
+    else:
+        query["granularity"] = "day"
+        query["bucket"] = {"$gte": rollup_bucket(start or datetime.min, "day"), "$lt": end or datetime.utcnow()}
+    if keys is not None:
+        query["key"] = {"$in": keys}
+
+    def in_range(sketch_key) -> bool:
+        sketch_dimension, granularity, key, bucket = sketch_key
+        if sketch_dimension != dimension or granularity != query["granularity"] or (keys is not None and key not in keys):
+            return False
+        return bucket is None or query["bucket"]["$gte"] <= bucket < query["bucket"]["$lt"]
+
+    sketches: Dict[str, HyperLogLog] = {}
+    async for doc in db.unique_viewer_sketches.find(query, {"_id": 0, "key": 1, "registers": 1}):
+        sketches.setdefault(doc["key"], HyperLogLog()).merge(HyperLogLog.from_bytes(doc["registers"]))
+    # Include viewers that haven't been flushed yet
+    for sketch_key, sketch in list(pending_viewer_sketches.items()):
+        if in_range(sketch_key):
+            sketches.setdefault(sketch_key[2], HyperLogLog()).merge(sketch)
+    return {key: sketch.count() for key, sketch in sketches.items()}
+
+async def rebuild_viewer_sketches() -> int:
+    """Recompute every unique-viewer sketch from video_progress, e.g. after videos change category.
+
+    Progress is streamed and sketches are written every UNIQUE_VIEWERS_REBUILD_BATCH_SKETCHES,
+    merging with whatever this rebuild (or a concurrent flush) already wrote, so memory
+    stays bounded however much history there is
+    """
+    started = datetime.utcnow()
+    retained_since = rollup_bucket(started - timedelta(days=UNIQUE_VIEWERS_DAILY_RETENTION_DAYS), "day")
+    video_categories = {
+        v["id"]: v.get("categoryId") async for v in db.videos.find({}, {"_id": 0, "id": 1, "categoryId": 1})
+    }
+    sketches: Dict[Tuple[str, str, str, Optional[datetime]], HyperLogLog] = {}
+    written = set()
+    progress = db.video_progress.find({}, {"_id": 0, "user_email": 1, "video_id": 1, "created_at": 1, "last_watched": 1})
+    async for p in progress.sort("video_id", ASCENDING).batch_size(5000):
+        # Only the first and latest activity of each row are known, so those days count
+        days = {rollup_bucket(p.get(field) or started, "day") for field in ("created_at", "last_watched")}
+        keys = [("video", p["video_id"])]
+        if video_categories.get(p["video_id"]) is not None:
+            keys.append(("category", video_categories[p["video_id"]]))
+        for dimension, key in keys:
+            buckets = [("all", None)] + [("day", day) for day in days if day >= retained_since]
+            for granularity, bucket in buckets:
+                sketches.setdefault((dimension, granularity, key, bucket), HyperLogLog()).add(p["user_email"])
+        if len(sketches) >= UNIQUE_VIEWERS_REBUILD_BATCH_SKETCHES:
+            await merge_viewer_sketches(sketches, since=started)
+            written.update(sketches)
+            sketches = {}
+    if sketches:
+        await merge_viewer_sketches(sketches, since=started)
+        written.update(sketches)
+
+    # Anything not rebuilt and not flushed since belongs to deleted videos or old categories
+    await db.unique_viewer_sketches.delete_many({"updated_at": {"$lt": started}})
+    await mark_seeded("unique_viewer_sketches")
+    return len(written)
+
+# Helper functions for most-watched tracking. Views are counted in an all-time
+# Space-Saving summary plus one per day; the last N daily summaries merge into a window
+pending_top_video_sketches: Dict[Tuple[str, Optional[datetime]], SpaceSaving] = {}
+
+async def record_top_videos(changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]):
+    """Count a view for every newly started video in the in-memory summaries"""
+    for before, after in changes:
+        if before is not None:
+            continue
+        day = rollup_bucket(after.get("created_at") or after.get("last_watched") or datetime.utcnow(), "day")
+        for granularity, bucket in (("all", None), ("day", day)):
+            sketch = pending_top_video_sketches.setdefault((granularity, bucket), SpaceSaving(TOP_VIDEOS_CAPACITY))
+            sketch.add(after["video_id"])
+
+async def flush_top_video_sketches() -> int:
+    """Add pending counters to the stored summaries; a failed flush keeps them for the next run"""
+    global pending_top_video_sketches
+    pending, pending_top_video_sketches = pending_top_video_sketches, {}
+    if not pending:
+        return 0
+    try:
+        stored = db.top_video_sketches.find(
+            {"$or": [{"granularity": granularity, "bucket": bucket} for granularity, bucket in pending]},
+            {"_id": 0, "granularity": 1, "bucket": 1, "counters": 1}
+        )
+        merged = {}
+        async for doc in stored:
+            merged[(doc["granularity"], doc["bucket"])] = SpaceSaving.from_list(doc["counters"], TOP_VIDEOS_CAPACITY)
+        operations = []
+        for (granularity, bucket), sketch in pending.items():
+            combined = merged.get((granularity, bucket), SpaceSaving(TOP_VIDEOS_CAPACITY)).merge(sketch)
+            update = {"$set": {"counters": combined.to_list(), "updated_at": datetime.utcnow()}}
+            if granularity == "day":
+                update["$set"]["expire_at"] = bucket + timedelta(days=TOP_VIDEOS_WINDOWS["7d"] + 1)
+            operations.append(UpdateOne({"granularity": granularity, "bucket": bucket}, update, upsert=True))
+        await db.top_video_sketches.bulk_write(operations, ordered=False)
+    except Exception:
+        for sketch_key, sketch in pending.items():
+            pending_top_video_sketches.setdefault(sketch_key, SpaceSaving(TOP_VIDEOS_CAPACITY)).merge(sketch)
+        raise
+    return len(pending)
+
+async def rebuild_top_video_sketches() -> int:
+    """Recount the all-time and recent daily summaries from video_progress"""
+    global pending_top_video_sketches
+    pending_top_video_sketches = {}
+    since = rollup_bucket(datetime.utcnow(), "day") - timedelta(days=TOP_VIDEOS_WINDOWS["7d"] - 1)
+    all_time = SpaceSaving(TOP_VIDEOS_CAPACITY)
+    async for group in db.video_progress.aggregate([{"$group": {"_id": "$video_id", "views": {"$sum": 1}}}], allowDiskUse=True):
+        all_time.add(group["_id"], group["views"])
+    daily: Dict[datetime, SpaceSaving] = {}
+    recent = db.video_progress.find(
+        {"created_at": {"$gte": since}}, {"_id": 0, "video_id": 1, "created_at": 1}
+    ).batch_size(5000)
+    async for p in recent:
+        daily.setdefault(rollup_bucket(p["created_at"], "day"), SpaceSaving(TOP_VIDEOS_CAPACITY)).add(p["video_id"])
+
+    operations = [ReplaceOne(
+        {"granularity": "all", "bucket": None},
+        {"granularity": "all", "bucket": None, "counters": all_time.to_list(), "updated_at": datetime.utcnow()},
+        upsert=True
+    )]
+    for bucket, sketch in daily.items():
+        operations.append(ReplaceOne(
+            {"granularity": "day", "bucket": bucket},
+            {
+                "granularity": "day", "bucket": bucket, "counters": sketch.to_list(), "updated_at": datetime.utcnow(),
+                "expire_at": bucket + timedelta(days=TOP_VIDEOS_WINDOWS["7d"] + 1)
+            },
+            upsert=True
+        ))
+    await db.top_video_sketches.bulk_write(operations, ordered=False)
+    await db.top_video_sketches.delete_many({"granularity": "day", "bucket": {"$gte": since, "$nin": list(daily)}})
+    await mark_seeded("top_video_sketches")
+    return len(operations)
+
+async def top_existing_videos(top_counts: List[Tuple[str, int, int]], k: int) -> List[Tuple[str, int, int]]:
+    """The first k entries whose video still exists, checked against the catalog cache"""
+    videos_by_id = (await get_catalog())["videos_by_id"]
+    return [entry for entry in top_counts if entry[0] in videos_by_id][:k]
+
+async def get_top_video_counts(window: str, k: int) -> List[Tuple[str, int, int]]:
+    """(video_id, views, error) of the k most watched videos in a window, without scanning video_progress"""
+    days = TOP_VIDEOS_WINDOWS[window]
+    if days is None:
+        query = {"granularity": "all"}
+    else:
+        since = rollup_bucket(datetime.utcnow(), "day") - timedelta(days=days - 1)
+        query = {"granularity": "day", "bucket": {"$gte": since}}
+
+    stored = await db.top_video_sketches.find(query, {"_id": 0, "counters": 1}).to_list(None)
+
+    combined = SpaceSaving(TOP_VIDEOS_CAPACITY)
+    for doc in stored:
+        combined.merge(SpaceSaving.from_list(doc["counters"], TOP_VIDEOS_CAPACITY))
+    for (granularity, bucket), sketch in list(pending_top_video_sketches.items()):
+        if granularity == query["granularity"] and (bucket is None or bucket >= query["bucket"]["$gte"]):
+            combined.merge(sketch)
+    return combined.top(k)
+
+# Helper functions for audience retention. Each user's watched segments of a video are
+# stored run-length encoded as [[first, last], ...]; video_retention holds per-segment
+# viewer counts, incremented only for segments a viewer hadn't watched before
+pending_watched_segments: Dict[Tuple[str, str], set] = {}
+
+def segments_to_runs(segments) -> List[List[int]]:
+    runs = []
+    for segment in sorted(segments):
+        if runs and segment == runs[-1][1] + 1:
+            runs[-1][1] = segment
+        else:
+            runs.append([segment, segment])
+    return runs
+
+def runs_to_segments(runs: List[List[int]]) -> set:
+    return {segment for first, last in runs for segment in range(first, last + 1)}
+
+def record_watched_positions(events: List[Dict[str, Any]]):
+    """Mark the segment at each heartbeat's playback position (sent as watch_time) as watched"""
+    for event in events:
+        segment = int((event.get("watch_time") or 0) // RETENTION_SEGMENT_SECONDS)
+        if 0 <= segment < RETENTION_MAX_SEGMENTS:
+            pending_watched_segments.setdefault((event["user_email"], event["video_id"]), set()).add(segment)
+
+async def flush_watched_segments() -> int:
+    """Merge pending segments into watched_segments and count newly watched ones in video_retention"""
+    global pending_watched_segments
+    pending, pending_watched_segments = pending_watched_segments, {}
+    if not pending:
+        return 0
+    try:
+        keys = list(pending)
+        stored = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            query = {"$or": [{"user_email": user_email, "video_id": video_id} for user_email, video_id in chunk]}
+            async for doc in db.watched_segments.find(query, {"_id": 0, "user_email": 1, "video_id": 1, "runs": 1}):
+                stored[(doc["user_email"], doc["video_id"])] = runs_to_segments(doc.get("runs", []))
+
+        now = datetime.utcnow()
+        segment_operations = []
+        retention_deltas = {}
+        for (user_email, video_id), segments in pending.items():
+            previous = stored.get((user_email, video_id))
+            added = segments - (previous or set())
+            if not added:
+                continue
+            segment_operations.append(UpdateOne(
+                {"user_email": user_email, "video_id": video_id},
+                {"$set": {"runs": segments_to_runs(segments | (previous or set())), "updated_at": now}},
+                upsert=True
+            ))
+            delta = retention_deltas.setdefault(video_id, {"viewers": 0})
+            if previous is None:
+                delta["viewers"] += 1
+            for segment in added:
+                delta[f"segments.{segment}"] = delta.get(f"segments.{segment}", 0) + 1
+
+        if segment_operations:
+            await db.watched_segments.bulk_write(segment_operations, ordered=False)
+            await db.video_retention.bulk_write([
+                UpdateOne({"video_id": video_id}, {"$inc": delta, "$set": {"updated_at": now}}, upsert=True)
+                for video_id, delta in retention_deltas.items()
+            ], ordered=False)
+    except Exception:
+        for key, segments in pending.items():
+            pending_watched_segments.setdefault(key, set()).update(segments)
+        raise
+    return len(pending)
+
+async def rebuild_video_retention() -> int:
+    """Recount video_retention from watched_segments, e.g. after concurrent flushes double-counted"""
+    started = datetime.utcnow()
+    histograms: Dict[str, Dict[str, Any]] = {}
+    async for doc in db.watched_segments.find({}, {"_id": 0, "video_id": 1, "runs": 1}).batch_size(5000):
+        histogram = histograms.setdefault(doc["video_id"], {"viewers": 0, "segments": {}})
+        histogram["viewers"] += 1
+        for first, last in doc.get("runs", []):
+            for segment in range(first, last + 1):
+                histogram["segments"][str(segment)] = histogram["segments"].get(str(segment), 0) + 1
+
+    operations = [
+        ReplaceOne({"video_id": video_id}, {"video_id": video_id, **histogram, "updated_at": started}, upsert=True)
+        for video_id, histogram in histograms.items()
+    ]
+    for i in range(0, len(operations), 1000):
+        await db.video_retention.bulk_write(operations[i:i + 1000], ordered=False)
+    await db.video_retention.delete_many({"video_id": {"$nin": list(histograms)}})
+    return len(operations)
+
 @api_router.get("/video-stats/{video_id}")
 async def get_video_stats(video_id: str):
     stats = await calculate_video_stats(video_id)
@@ -513,24 +1947,45 @@ async def get_video_stats(video_id: str):
 # Enhanced video endpoint with statistics
 @api_router.get("/videos/{video_id}/detailed")
 async def get_video_detailed(video_id: str):
-    video = await db.videos.find_one({"id": video_id})
-    if not video:
+    videos_with_stats = await get_videos_with_stats([video_id])
+    if video_id not in videos_with_stats:
         raise HTTPException(status_code=404, detail="Video no encontrado")
     
-    stats = await calculate_video_stats(video_id)
-    return VideoWithStats(**video, stats=stats)
+    return videos_with_stats[video_id]
+
+@api_router.get("/videos/{video_id}/retention")
+async def get_video_retention(video_id: str):
+    """Audience retention curve: share of viewers who watched each segment of the video"""
+    retention = await db.video_retention.find_one({"video_id": video_id}, {"_id": 0})
+    viewers = (retention or {}).get("viewers", 0)
+    counts = {int(segment): count for segment, count in ((retention or {}).get("segments") or {}).items() if count}
+    curve = [
+        {
+            "segment": segment,
+            "start_seconds": segment * RETENTION_SEGMENT_SECONDS,
+            "viewers": counts.get(segment, 0),
+            "retention": (counts.get(segment, 0) / viewers * 100) if viewers > 0 else 0
+        }
+        for segment in range(max(counts) + 1 if counts else 0)
+    ]
+    return {"video_id": video_id, "segment_seconds": RETENTION_SEGMENT_SECONDS, "viewers": viewers, "curve": curve}
 
 # Enhanced Video Management Endpoints
 
 @api_router.delete("/videos/{video_id}")
 async def delete_video(video_id: str):
     # Delete video
-    result = await db.videos.delete_one({"id": video_id})
-    if result.deleted_count == 0:
+    video = await db.videos.find_one_and_delete({"id": video_id}, {"categoryId": 1})
+    if video is None:
         raise HTTPException(status_code=404, detail="Video no encontrado")
+    await bump_cache_version("catalog")
     
-    # Also delete any progress records for this video
+    # Also delete any progress records and statistics for this video
+    await remove_video_from_summaries(video_id, video.get("categoryId"))
     await db.video_progress.delete_many({"video_id": video_id})
+    await db.video_stats.delete_one({"video_id": video_id})
+    await db.watched_segments.delete_many({"video_id": video_id})
+    await db.video_retention.delete_one({"video_id": video_id})
     
     return {"message": "Video eliminado exitosamente"}
 
@@ -539,6 +1994,7 @@ async def delete_video(video_id: str):
 async def create_category(category_data: CategoryCreate):
     category_obj = Category(**category_data.dict())
     await db.categories.insert_one(category_obj.dict())
+    await bump_cache_version("catalog")
     return category_obj
 
 @api_router.put("/categories/{category_id}")
@@ -550,6 +2006,7 @@ async def update_category(category_id: str, category_data: CategoryCreate):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
+    await bump_cache_version("catalog")
     
     return {"message": "Categoría actualizada exitosamente"}
 
@@ -560,154 +2017,12 @@ async def delete_category(category_id: str):
     
     # Delete the category
     result = await db.categories.delete_one({"id": category_id})
+    await bump_cache_version("catalog")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
     return {"message": "Categoría y videos asociados eliminados exitosamente"}
 
-# Video Progress Tracking Endpoints
-@api_router.post("/video-progress", response_model=VideoProgress)
-async def create_or_update_video_progress(progress_data: VideoProgressCreate):
-    # Check if progress already exists for this user and video
-    existing_progress = await db.video_progress.find_one({
-        "user_email": progress_data.user_email,
-        "video_id": progress_data.video_id
-    })
-    
-    if existing_progress:
-        # Update existing progress
-        update_data = progress_data.dict()
-        update_data["last_watched"] = datetime.utcnow()
-        
-        await db.video_progress.update_one(
-            {"user_email": progress_data.user_email, "video_id": progress_data.video_id},
-            {"$set": update_data}
-        )
-        
-        # Return updated progress
-        updated_progress = await db.video_progress.find_one({
-            "user_email": progress_data.user_email,
-            "video_id": progress_data.video_id
-        })
-        return VideoProgress(**updated_progress)
-    else:
-        # Create new progress record
-        progress_obj = VideoProgress(**progress_data.dict())
-        await db.video_progress.insert_one(progress_obj.dict())
-        return progress_obj
-
-@api_router.get("/video-progress/{user_email}")
-async def get_user_video_progress(user_email: str):
-    progress_list = await db.video_progress.find({"user_email": user_email}).to_list(1000)
-    return [VideoProgress(**progress) for progress in progress_list]
-
-@api_router.get("/video-progress/{user_email}/{video_id}")
-async def get_video_progress(user_email: str, video_id: str):
-    progress = await db.video_progress.find_one({
-        "user_email": user_email,
-        "video_id": video_id
-    })
-    if not progress:
-        return {"progress_percentage": 0.0, "watch_time": 0, "completed": False}
-    return VideoProgress(**progress)
-
-@api_router.put("/video-progress/{user_email}/{video_id}")
-async def update_video_progress(user_email: str, video_id: str, progress_update: VideoProgressUpdate):
-    update_data = {k: v for k, v in progress_update.dict().items() if v is not None}
-    update_data["last_watched"] = datetime.utcnow()
-    
-    result = await db.video_progress.update_one(
-        {"user_email": user_email, "video_id": video_id},
-        {"$set": update_data}
-    )
-    
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Progreso no encontrado")
-    
-    return {"message": "Progreso actualizado exitosamente"}
-
-@api_router.get("/dashboard/{user_email}")
-async def get_user_dashboard(user_email: str):
-    # Get all progress for user
-    progress_list = await db.video_progress.find({"user_email": user_email}).to_list(1000)
-    
-    # Calculate statistics
-    total_videos_watched = len(progress_list)
-    total_videos_completed = sum(1 for p in progress_list if p.get("completed", False))
-    total_watch_time = sum(p.get("watch_time", 0) for p in progress_list)
-    completion_rate = (total_videos_completed / total_videos_watched * 100) if total_videos_watched > 0 else 0
-    
-    # Get recent videos (last 5 watched)
-    recent_progress = sorted(progress_list, key=lambda x: x.get("last_watched", datetime.min), reverse=True)[:5]
-    recent_videos = []
-    
-    for progress in recent_progress:
-        video = await db.videos.find_one({"id": progress["video_id"]})
-        if video:
-            video_stats = await calculate_video_stats(progress["video_id"])
-            video_with_stats = VideoWithStats(**video, stats=video_stats)
-            recent_videos.append(video_with_stats)
-    
-    # Get progress by category
-    progress_by_category = {}
-    categories = await db.categories.find().to_list(1000)
-    
-    for category in categories:
-        category_videos = await db.videos.find({"categoryId": category["id"]}).to_list(1000)
-        category_video_ids = [v["id"] for v in category_videos]
-        
-        category_progress = [p for p in progress_list if p["video_id"] in category_video_ids]
-        watched_count = len(category_progress)
-        completed_count = sum(1 for p in category_progress if p.get("completed", False))
-        
-        progress_by_category[category["name"]] = {
-            "total_videos": len(category_videos),
-            "watched_videos": watched_count,
-            "completed_videos": completed_count,
-            "completion_rate": (completed_count / watched_count * 100) if watched_count > 0 else 0
-        }
-    
-    return UserDashboard(
-        user_email=user_email,
-        total_videos_watched=total_videos_watched,
-        total_videos_completed=total_videos_completed,
-        total_watch_time=total_watch_time,
-        completion_rate=completion_rate,
-        recent_videos=recent_videos,
-        progress_by_category=progress_by_category
-    )
-
-# Helper function to calculate video statistics
-async def calculate_video_stats(video_id: str) -> VideoStats:
-    progress_list = await db.video_progress.find({"video_id": video_id}).to_list(1000)
-    
-    total_views = len(progress_list)
-    total_completions = sum(1 for p in progress_list if p.get("completed", False))
-    average_completion_rate = (total_completions / total_views * 100) if total_views > 0 else 0
-    average_watch_time = sum(p.get("watch_time", 0) for p in progress_list) // total_views if total_views > 0 else 0
-    
-    return VideoStats(
-        total_views=total_views,
-        total_completions=total_completions,
-        average_completion_rate=average_completion_rate,
-        average_watch_time=average_watch_time
-    )
-
-@api_router.get("/video-stats/{video_id}")
-async def get_video_stats(video_id: str):
-    stats = await calculate_video_stats(video_id)
-    return stats
-
-# Enhanced video endpoint with statistics
-@api_router.get("/videos/{video_id}/detailed")
-async def get_video_detailed(video_id: str):
-    video = await db.videos.find_one({"id": video_id})
-    if not video:
-        raise HTTPException(status_code=404, detail="Video no encontrado")
-    
-    stats = await calculate_video_stats(video_id)
-    return VideoWithStats(**video, stats=stats)
-
 # User management endpoints
 @api_router.post("/users", response_model=User)
 async def create_user(user_create: UserCreate):
@@ -726,7 +2041,7 @@ async def create_user(user_create: UserCreate):
 @api_router.get("/users", response_model=List[User])
 async def get_users():
     users = await db.users.find().to_list(1000)
-    return [User(**user) for user in users]
+    return json_list_response(USER_LIST, USER_LIST.validate_python(users))
 
 @api_router.delete("/users/{user_id}")
 async def delete_user(user_id: str):
@@ -737,43 +2052,9 @@ async def delete_user(user_id: str):
 
 # Category management endpoints
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories():
-    categories = await db.categories.find().to_list(1000)
-    if not categories:
-        # Initialize with default categories if none exist
-        await initialize_default_categories()
-        categories = await db.categories.find().to_list(1000)
-    
-    # Get videos for each category
-    for category in categories:
-        category_videos = await db.videos.find({"categoryId": category["id"]}).to_list(1000)
-        category["videos"] = [Video(**video) for video in category_videos]
-    
-    return [Category(**category) for category in categories]
-
-@api_router.post("/categories", response_model=Category)
-async def create_category(category_create: CategoryCreate):
-    category_dict = category_create.dict()
-    category_obj = Category(**category_dict)
-    await db.categories.insert_one(category_obj.dict())
-    return category_obj
-
-@api_router.put("/categories/{category_id}")
-async def update_category(category_id: str, category_update: CategoryCreate):
-    result = await db.categories.update_one(
-        {"id": category_id}, 
-        {"$set": category_update.dict()}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Categoría no encontrada")
-    return {"message": "Categoría actualizada exitosamente"}
-
-@api_router.delete("/categories/{category_id}")
-async def delete_category(category_id: str):
-    result = await db.categories.delete_one({"id": category_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Categoría no encontrada")
-    return {"message": "Categoría eliminada exitosamente"}
+async def get_categories(request: Request):
+    catalog = await get_catalog()
+    return encoded_json_response(request, catalog["encoded"]["categories"])
 
 # MP4 File Upload endpoint with enhanced capabilities
 @api_router.post("/upload-mp4")
@@ -915,6 +2196,7 @@ async def upload_mp4_video(
         
         video_obj = Video(**video_data)
         await db.videos.insert_one(video_obj.dict())
+        await bump_cache_version("catalog")
         
         logger.info(f"MP4 video uploaded successfully: {title} ({file_size_mb:.2f}MB)")
         
@@ -933,28 +2215,60 @@ async def upload_mp4_video(
         raise HTTPException(status_code=500, detail=f"Error al subir archivo: {str(e)}")
 
 @api_router.get("/videos", response_model=List[Video])
-async def get_all_videos():
-    videos = await db.videos.find().to_list(1000)
-    
-    # Add backward compatibility for videos without video_type
-    processed_videos = []
-    for video in videos:
-        if 'video_type' not in video or not video['video_type']:
-            video['video_type'] = 'youtube'  # Default to youtube for existing videos
-        
-        # Ensure all required fields exist
-        if 'youtubeId' not in video:
-            video['youtubeId'] = None
-        if 'vimeoId' not in video:
-            video['vimeoId'] = None
-        if 'mp4_url' not in video:
-            video['mp4_url'] = None
-        if 'mp4_filename' not in video:
-            video['mp4_filename'] = None
-            
-        processed_videos.append(Video(**video))
-    
-    return processed_videos
+async def get_all_videos(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    categoryId: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    video_type: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """All videos from the catalog cache, or a filtered keyset page ordered by id.
+
+    With any parameter the videos are read with an indexed query: fields is a comma
+    separated list of Video fields to return (id is always included), and the cursor
+    for the next page is returned in the X-Next-Cursor header.
+    """
+    if limit is None and after is None and categoryId is None and difficulty is None \
+            and video_type is None and fields is None:
+        catalog = await get_catalog()
+        return encoded_json_response(request, catalog["encoded"]["videos"])
+
+    selected = parse_video_fields(fields)
+    query: Dict[str, Any] = {}
+    if categoryId is not None:
+        query["categoryId"] = categoryId
+    if difficulty is not None:
+        query["difficulty"] = difficulty
+    if video_type is not None:
+        # Videos stored before video_type existed are YouTube videos
+        query["video_type"] = {"$in": ["youtube", None, ""]} if video_type == "youtube" else video_type
+    if after:
+        query["id"] = {"$gt": decode_cursor(after, string_fields=("id",))["id"]}
+
+    page_size = limit or 1000
+    projection = VIDEO_PROJECTION if selected is None else {"_id": 0, **{field: 1 for field in selected}}
+    videos = await db.videos.find(query, projection).sort("id", ASCENDING).limit(page_size + 1).to_list(page_size + 1)
+
+    headers = {}
+    if len(videos) > page_size:
+        videos = videos[:page_size]
+        headers["X-Next-Cursor"] = encode_cursor({"id": videos[-1]["id"]})
+    if selected is None:
+        return json_list_response(VIDEO_LIST, VIDEO_LIST.validate_python(list(map(normalize_video, videos))), headers)
+    content = [{field: video.get(field) for field in selected} for video in map(normalize_video, videos)]
+    return JSONResponse(jsonable_encoder(content), headers=headers)
+
+def parse_video_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validated field list for a sparse fieldset, in model order; None selects every field"""
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(Video.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    return [field for field in Video.model_fields if field in requested or field == "id"]
 
 # Enhanced MP4 serving endpoint for chunked files
 @api_router.get("/videos/{video_id}/mp4-stream")
@@ -979,13 +2293,11 @@ async def stream_mp4_video(video_id: str):
             file_ref_id = mp4_url.replace("chunked://", "")
             
             # Get all chunks for this file
-            chunks = await db.video_chunks.find({"file_ref_id": file_ref_id}).to_list(10000)
+            # Sorted by the (file_ref_id, chunk_index) index
+            chunks = await db.video_chunks.find({"file_ref_id": file_ref_id}).sort("chunk_index", ASCENDING).to_list(10000)
             if not chunks:
                 raise HTTPException(status_code=404, detail="Chunks de archivo no encontrados")
             
-            # Sort chunks by index
-            chunks.sort(key=lambda x: x["chunk_index"])
-            
             # Reconstruct file from chunks
             file_content = bytearray()
             for chunk in chunks:
@@ -1079,6 +2391,7 @@ async def create_video(video_create: VideoCreate):
     
     video_obj = Video(**video_dict)
     await db.videos.insert_one(video_obj.dict())
+    await bump_cache_version("catalog")
     return video_obj
 
 @api_router.put("/videos/{video_id}")
@@ -1103,27 +2416,26 @@ async def update_video(video_id: str, video_update: VideoUpdate):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Video no encontrado")
+    await bump_cache_version("catalog")
     
-    return {"message": "Video actualizado exitosamente"}
-
-@api_router.delete("/videos/{video_id}")
-async def delete_video(video_id: str):
-    # Delete from videos collection
-    result = await db.videos.delete_one({"id": video_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Video no encontrado")
+    if update_data.get("categoryId") and update_data["categoryId"] != existing_video.get("categoryId"):
+        await move_video_category_in_summaries(video_id, existing_video.get("categoryId"), update_data["categoryId"])
     
-    return {"message": "Video eliminado exitosamente"}
+    return {"message": "Video actualizado exitosamente"}
 
 # Settings management endpoints
 @api_router.get("/settings", response_model=Settings)
-async def get_settings():
+async def get_settings(request: Request):
+    return encoded_json_response(request, await get_cached_response("settings", load_settings))
+
+async def load_settings() -> Settings:
     settings = await db.settings.find_one()
     if not settings:
         # Create default settings if none exist
-        default_settings = Settings()
-        await db.settings.insert_one(default_settings.dict())
-        return default_settings
+        await db.settings.insert_one(Settings().dict())
+        await bump_cache_version("settings")
+        # Read back, so the cached body matches what MongoDB stored (millisecond datetimes)
+        settings = await db.settings.find_one()
     return Settings(**settings)
 
 @api_router.put("/settings", response_model=Settings)
@@ -1142,6 +2454,7 @@ async def update_settings(settings_update: SettingsUpdate):
         {"$set": update_dict},
         upsert=True
     )
+    await bump_cache_version("settings")
     
     # Return updated settings
     updated_settings = await db.settings.find_one()
@@ -1149,7 +2462,10 @@ async def update_settings(settings_update: SettingsUpdate):
 
 # Banner video endpoints
 @api_router.get("/banner-video")
-async def get_banner_video():
+async def get_banner_video(request: Request):
+    return encoded_json_response(request, await get_cached_response("banner_video", load_banner_video))
+
+async def load_banner_video() -> Optional[BannerVideo]:
     banner_video = await db.banner_videos.find_one()
     if not banner_video:
         return None
@@ -1163,66 +2479,193 @@ async def set_banner_video(banner_video_create: BannerVideoCreate):
     # Replace existing banner video
     await db.banner_videos.delete_many({})
     await db.banner_videos.insert_one(banner_video_obj.dict())
+    await bump_cache_version("banner_video")
     
     return banner_video_obj
 
 @api_router.delete("/banner-video")
 async def delete_banner_video():
     result = await db.banner_videos.delete_many({})
+    await bump_cache_version("banner_video")
     return {"message": "Banner video eliminado exitosamente"}
 
 # Admin Statistics Endpoint
+# Helper functions for stats snapshots. Each snapshot is recomputed on its cadence by a
+# background job and kept in memory and in stats_snapshots, so every worker and restart
+# can serve it; requests only recompute when the snapshot is older than they accept
+stats_snapshots: Dict[str, Dict[str, Any]] = {}
+snapshot_refreshes: Dict[str, asyncio.Task] = {}
+# Snapshot payloads are split into chunks of this size, like MP4 uploads in video_chunks,
+# so a snapshot with a row per user stays clear of the 16 MB document limit
+SNAPSHOT_CHUNK_BYTES = 4 * 1024 * 1024
+
+async def compute_snapshot(name: str) -> Dict[str, Any]:
+    compute, _ = STATS_SNAPSHOTS[name]
+    snapshot = {"data": jsonable_encoder(await compute()), "computed_at": datetime.utcnow()}
+    # Serve it from this worker even if persisting fails
+    stats_snapshots[name] = snapshot
+    try:
+        await persist_snapshot(name, snapshot)
+    except Exception as e:
+        logger.error(f"Error persisting {name} snapshot: {str(e)}")
+    return snapshot
+
+async def persist_snapshot(name: str, snapshot: Dict[str, Any]):
+    """Write the chunks first and then the header pointing at them, then drop older chunks"""
+    # Stored as JSON text: category names are used as keys and may not be valid field names
+    payload = json.dumps(snapshot["data"]).encode("utf-8")
+    computed_at = snapshot["computed_at"]
+    chunks = [payload[i:i + SNAPSHOT_CHUNK_BYTES] for i in range(0, len(payload), SNAPSHOT_CHUNK_BYTES)] or [b""]
+    for chunk_index, chunk in enumerate(chunks):
+        await db.stats_snapshot_chunks.insert_one(
+            {"snapshot": name, "computed_at": computed_at, "chunk_index": chunk_index, "data": chunk}
+        )
+    await db.stats_snapshots.replace_one(
+        {"_id": name},
+        {"_id": name, "chunks": len(chunks), "computed_at": computed_at},
+        upsert=True
+    )
+    await db.stats_snapshot_chunks.delete_many({"snapshot": name, "computed_at": {"$ne": computed_at}})
+
+async def refresh_snapshot(name: str) -> Dict[str, Any]:
+    """Recompute a snapshot; concurrent callers share the one recomputation already running"""
+    refresh = snapshot_refreshes.get(name)
+    if refresh is None:
+        refresh = asyncio.create_task(compute_snapshot(name))
+        snapshot_refreshes[name] = refresh
+        refresh.add_done_callback(lambda _: snapshot_refreshes.pop(name, None))
+    return await asyncio.shield(refresh)
+
+async def load_snapshot(name: str) -> Optional[Dict[str, Any]]:
+    """The newest snapshot from memory or from another worker's write"""
+    snapshot = stats_snapshots.get(name)
+    stored = await db.stats_snapshots.find_one(
+        {"_id": name, "computed_at": {"$gt": snapshot["computed_at"]}} if snapshot else {"_id": name}
+    )
+    if stored:
+        chunks = await db.stats_snapshot_chunks.find(
+            {"snapshot": name, "computed_at": stored["computed_at"]}, {"_id": 0, "data": 1}
+        ).sort("chunk_index", ASCENDING).to_list(None)
+        # A newer write may have removed these chunks meanwhile; keep what we have
+        if len(chunks) == stored.get("chunks"):
+            snapshot = {
+                "data": json.loads(b"".join(chunk["data"] for chunk in chunks)),
+                "computed_at": stored["computed_at"]
+            }
+            stats_snapshots[name] = snapshot
+    return snapshot
+
+def snapshot_age(snapshot: Dict[str, Any]) -> float:
+    return (datetime.utcnow() - snapshot["computed_at"]).total_seconds()
+
+async def refresh_stale_snapshot(name: str):
+    """Scheduled refresh; skipped when another worker refreshed within the cadence"""
+    _, interval_seconds = STATS_SNAPSHOTS[name]
+    snapshot = await load_snapshot(name)
+    if snapshot is None or snapshot_age(snapshot) >= interval_seconds:
+        await refresh_snapshot(name)
+
+async def get_snapshot(name: str, response: Response, max_staleness: Optional[float] = None) -> Dict[str, Any]:
+    """Snapshot data plus its age; recomputed first only if missing or older than max_staleness seconds"""
+    snapshot = stats_snapshots.get(name)
+    if snapshot is None or (max_staleness is not None and snapshot_age(snapshot) > max_staleness):
+        snapshot = await load_snapshot(name)
+    if snapshot is None or (max_staleness is not None and snapshot_age(snapshot) > max_staleness):
+        snapshot = await refresh_snapshot(name)
+    age = max(snapshot_age(snapshot), 0)
+    response.headers["Age"] = str(int(age))
+    return {
+        **snapshot["data"],
+        "snapshot": {"computed_at": snapshot["computed_at"], "age_seconds": round(age, 1)}
+    }
+
 @api_router.get("/admin/stats")
-async def get_admin_stats():
-    # Get total counts
-    total_users = len(await db.users.find().to_list(1000))
-    total_videos = len(await db.videos.find().to_list(1000))
-    total_categories = len(await db.categories.find().to_list(1000))
-    
-    # Get progress statistics
-    all_progress = await db.video_progress.find().to_list(10000)
-    total_video_views = len(all_progress)
-    total_completions = sum(1 for p in all_progress if p.get("completed", False))
-    total_watch_time = sum(p.get("watch_time", 0) for p in all_progress)
-    
-    # Get most watched videos
-    video_view_counts = {}
-    for progress in all_progress:
-        video_id = progress["video_id"]
-        video_view_counts[video_id] = video_view_counts.get(video_id, 0) + 1
-    
-    # Get top 5 most watched videos
-    top_videos = sorted(video_view_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    top_videos_detailed = []
-    
-    for video_id, view_count in top_videos:
-        video = await db.videos.find_one({"id": video_id})
-        if video:
-            stats = await calculate_video_stats(video_id)
-            top_videos_detailed.append({
-                "video": VideoWithStats(**video, stats=stats),
-                "view_count": view_count
-            })
-    
+async def get_admin_stats(response: Response, max_staleness: Optional[float] = Query(None, ge=0)):
+    """Admin overview from the latest snapshot; pass max_staleness (seconds) to require a fresher one"""
+    return await get_snapshot("admin_stats", response, max_staleness)
+
+async def compute_admin_stats() -> Dict[str, Any]:
+    # Everything is counted or grouped inside MongoDB, so memory use doesn't grow with the data
+    progress_pipeline = [
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "views": {"$sum": 1},
+                    "completions": {"$sum": {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}},
+                    "watch_time": {"$sum": {"$ifNull": ["$watch_time", 0]}}
+                }}
+            ],
+            "by_category": [
+                {"$group": {
+                    "_id": "$video_id",
+                    "views": {"$sum": 1},
+                    "completions": {"$sum": {"$cond": [{"$eq": ["$completed", True]}, 1, 0]}}
+                }},
+                {"$lookup": {
+                    "from": "videos",
+                    "localField": "_id",
+                    "foreignField": "id",
+                    "pipeline": [{"$project": {"_id": 0, "categoryId": 1}}],
+                    "as": "video"
+                }},
+                {"$unwind": "$video"},
+                {"$group": {
+                    "_id": "$video.categoryId",
+                    "views": {"$sum": "$views"},
+                    "completions": {"$sum": "$completions"}
+                }}
+            ]
+        }}
+    ]
+    total_users, total_videos, total_categories, progress_result, categories, category_reach, top_counts = await asyncio.gather(
+        db.users.count_documents({}),
+        db.videos.count_documents({}),
+        db.categories.count_documents({}),
+        db.video_progress.aggregate(progress_pipeline, allowDiskUse=True).to_list(1),
+        get_categories_with_video_counts(),
+        estimate_unique_viewers("category"),
+        get_top_video_counts("all", TOP_VIDEOS_CAPACITY)
+    )
+    facets = progress_result[0] if progress_result else {"totals": [], "by_category": []}
+
+    totals = facets["totals"][0] if facets["totals"] else {"views": 0, "completions": 0, "watch_time": 0}
+    total_video_views = totals["views"]
+    total_completions = totals["completions"]
+
+    # Top 5 most watched from the streaming summary; videos that no longer exist are dropped
+    top_counts = await top_existing_videos(top_counts, 5)
+    top_video_ids = [video_id for video_id, _, _ in top_counts]
+    videos_with_stats, video_reach = await asyncio.gather(
+        get_videos_with_stats(top_video_ids),
+        estimate_unique_viewers("video", top_video_ids)
+    )
+    top_videos_detailed = [
+        {
+            "video": videos_with_stats[video_id],
+            "view_count": view_count,
+            "unique_viewers": video_reach.get(video_id, 0)
+        }
+        for video_id, view_count, _ in top_counts
+        if video_id in videos_with_stats
+    ]
+
     # Get completion rate by category
-    categories = await db.categories.find().to_list(1000)
+    views_by_category = {entry["_id"]: entry for entry in facets["by_category"]}
     category_stats = {}
-    
     for category in categories:
-        category_videos = await db.videos.find({"categoryId": category["id"]}).to_list(1000)
-        category_video_ids = [v["id"] for v in category_videos]
-        
-        category_progress = [p for p in all_progress if p["video_id"] in category_video_ids]
-        watched_count = len(category_progress)
-        completed_count = sum(1 for p in category_progress if p.get("completed", False))
-        
+        category_views = views_by_category.get(category["id"], {"views": 0, "completions": 0})
+        watched_count = category_views["views"]
+        completed_count = category_views["completions"]
+
         category_stats[category["name"]] = {
-            "total_videos": len(category_videos),
+            "total_videos": category["total_videos"],
             "total_views": watched_count,
             "total_completions": completed_count,
-            "completion_rate": (completed_count / watched_count * 100) if watched_count > 0 else 0
+            "completion_rate": (completed_count / watched_count * 100) if watched_count > 0 else 0,
+            "unique_viewers": category_reach.get(category["id"], 0)
         }
-    
+
     return {
         "overview": {
             "total_users": total_users,
@@ -1230,13 +2673,222 @@ async def get_admin_stats():
             "total_categories": total_categories,
             "total_video_views": total_video_views,
             "total_completions": total_completions,
-            "total_watch_time": total_watch_time,
+            "total_watch_time": totals["watch_time"],
             "overall_completion_rate": (total_completions / total_video_views * 100) if total_video_views > 0 else 0
         },
         "top_videos": top_videos_detailed,
         "category_stats": category_stats
     }
 
+# Analytics rollup endpoints
+@api_router.get("/admin/rollups")
+async def get_rollups(
+    dimension: str = Query(..., pattern="^(video|category|user)$"),
+    granularity: str = Query("day", pattern="^(hour|day|week|month)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    key: Optional[str] = None
+):
+    """Watch time, views and completions per bucket, e.g. watch time by category per week"""
+    end = to_naive_utc(end) or datetime.utcnow()
+    start = to_naive_utc(start) or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="El rango de fechas no es válido")
+    series = await query_rollups(dimension, granularity, start, end, key)
+    return {"dimension": dimension, "granularity": granularity, "start": start, "end": end, "series": series}
+
+# Columnar analytics endpoints
+ANALYTICS_SORT_FIELDS = {
+    "videos": ("views", "completions", "total_watch_time", "average_progress", "completion_rate"),
+    "categories": ("views", "completions", "total_watch_time", "average_progress", "completion_rate", "unique_viewers", "video_count"),
+    "users": ("videos_watched", "videos_completed", "total_watch_time", "average_progress"),
+}
+
+@api_router.get("/admin/analytics/{dimension}")
+async def get_admin_analytics(
+    dimension: str,
+    response: Response,
+    sort_by: str = "total_watch_time",
+    limit: int = Query(100, ge=1, le=10000),
+    max_staleness: Optional[float] = Query(None, ge=0)
+):
+    """Per-video, per-category or per-user metrics computed over all of video_progress"""
+    if dimension not in ANALYTICS_SORT_FIELDS:
+        raise HTTPException(status_code=404, detail="Dimensión de analítica no encontrada")
+    if sort_by not in ANALYTICS_SORT_FIELDS[dimension]:
+        raise HTTPException(status_code=400, detail=f"No se puede ordenar por {sort_by}")
+
+    analytics = await get_snapshot("progress_analytics", response, max_staleness)
+    items = sorted(analytics[dimension], key=lambda item: item[sort_by], reverse=True)
+    return {
+        "dimension": dimension,
+        "total": len(items),
+        "items": items[:limit],
+        "rows": analytics["rows"],
+        "load_ms": analytics["load_ms"],
+        "compute_ms": analytics["compute_ms"],
+        "snapshot": analytics["snapshot"]
+    }
+
+# Snapshot name -> (compute function, refresh cadence in seconds)
+STATS_SNAPSHOTS = {
+    "admin_stats": (compute_admin_stats, ADMIN_STATS_REFRESH_SECONDS),
+    "progress_analytics": (lambda: get_progress_analytics(db), PROGRESS_ANALYTICS_REFRESH_SECONDS),
+}
+
+@api_router.post("/admin/snapshots/{name}/refresh")
+async def run_snapshot_refresh(name: str):
+    if name not in STATS_SNAPSHOTS:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    snapshot = await refresh_snapshot(name)
+    return {"name": name, "computed_at": snapshot["computed_at"]}
+
+# Most-watched endpoints
+@api_router.get("/admin/top-videos")
+async def get_top_videos(
+    window: str = Query("all", pattern="^(today|7d|all)$"),
+    k: int = Query(10, ge=1)
+):
+    """Live most-watched videos; view counts may overestimate by at most `error`"""
+    k = min(k, TOP_VIDEOS_CAPACITY)
+    # Candidates beyond k are only needed to skip deleted videos, before any stats lookup
+    top_counts = await top_existing_videos(await get_top_video_counts(window, TOP_VIDEOS_CAPACITY), k)
+    videos_with_stats = await get_videos_with_stats([video_id for video_id, _, _ in top_counts])
+    top_videos = [
+        {"video": videos_with_stats[video_id], "view_count": view_count, "error": error}
+        for video_id, view_count, error in top_counts
+        if video_id in videos_with_stats
+    ]
+    return {"window": window, "videos": top_videos}
+
+@api_router.post("/admin/video-retention/rebuild")
+async def run_video_retention_rebuild():
+    rebuilt = await rebuild_video_retention()
+    return {"rebuilt": rebuilt}
+
+@api_router.post("/admin/top-videos/rebuild")
+async def run_top_videos_rebuild():
+    rebuilt = await rebuild_top_video_sketches()
+    return {"rebuilt": rebuilt}
+
+# Progress export endpoints
+PROGRESS_EXPORT_COLUMNS = [
+    "id", "user_email", "video_id", "video_title", "category_id", "category_name",
+    "progress_percentage", "watch_time", "completed", "last_watched", "created_at"
+]
+
+@api_router.get("/admin/export/progress")
+async def export_progress(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    batch_size: int = Query(1000, ge=1, le=10000)
+):
+    """Stream all of video_progress with video and category names, oldest activity first.
+
+    Memory stays constant: rows are read from a server-side cursor and joined to
+    their videos one batch at a time. since= exports only rows watched at or after
+    that time, so the last exported last_watched can be passed on the next run.
+    """
+    query = {"last_watched": {"$gte": since}} if since else {}
+    cursor = db.video_progress.find(query, {"_id": 0}).sort([("last_watched", ASCENDING), ("id", ASCENDING)])
+    category_names = {c["id"]: c.get("name") async for c in db.categories.find({}, {"_id": 0, "id": 1, "name": 1})}
+
+    async def export_rows():
+        batch = []
+        async for progress in cursor.batch_size(batch_size):
+            batch.append(progress)
+            if len(batch) >= batch_size:
+                yield await join_export_batch(batch)
+                batch = []
+        if batch:
+            yield await join_export_batch(batch)
+
+    async def join_export_batch(batch):
+        video_ids = list({progress["video_id"] for progress in batch})
+        videos = {
+            v["id"]: v async for v in db.videos.find({"id": {"$in": video_ids}}, {"_id": 0, "id": 1, "title": 1, "categoryId": 1})
+        }
+        rows = []
+        for progress in batch:
+            video = videos.get(progress["video_id"], {})
+            row = {
+                **{column: progress.get(column) for column in PROGRESS_EXPORT_COLUMNS},
+                "video_title": video.get("title"),
+                "category_id": video.get("categoryId"),
+                "category_name": category_names.get(video.get("categoryId"))
+            }
+            rows.append({k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()})
+        return rows
+
+    if format == "csv":
+        async def stream_csv():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=PROGRESS_EXPORT_COLUMNS)
+            writer.writeheader()
+            async for rows in export_rows():
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        return StreamingResponse(
+            stream_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="video_progress.csv"'}
+        )
+
+    async def stream_ndjson():
+        async for rows in export_rows():
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+    return StreamingResponse(stream_ndjson(), media_type="application/x-ndjson")
+
+# Unique-viewer endpoints
+@api_router.get("/admin/unique-viewers")
+async def get_unique_viewers(
+    dimension: str = Query(..., pattern="^(video|category)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    key: Optional[str] = None
+):
+    """Estimated distinct viewers per video or category, all-time or for a date range"""
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="El rango de fechas no es válido")
+    reach = await estimate_unique_viewers(dimension, [key] if key else None, start, end)
+    items = sorted(({"key": k, "unique_viewers": v} for k, v in reach.items()), key=lambda item: item["unique_viewers"], reverse=True)
+    return {"dimension": dimension, "start": start, "end": end, "items": items}
+
+@api_router.post("/admin/unique-viewers/rebuild")
+async def run_unique_viewer_rebuild():
+    rebuilt = await rebuild_viewer_sketches()
+    return {"rebuilt": rebuilt}
+
+# User summary maintenance endpoints
+@api_router.post("/admin/user-summaries/rebuild")
+async def run_user_summary_rebuild(user_email: Optional[str] = None):
+    rebuilt = await rebuild_user_summaries(user_email)
+    return {"rebuilt": rebuilt}
+
+# Video statistics maintenance endpoints
+@api_router.post("/admin/video-stats/reconcile")
+async def run_video_stats_reconciliation():
+    return await reconcile_video_stats()
+
+# Progress event log endpoints
+@api_router.post("/admin/progress-events/compact")
+async def run_progress_compaction():
+    compacted = await compact_progress_events()
+    return {"compacted": compacted}
+
+# Index management endpoints
+@api_router.get("/admin/indexes")
+async def get_index_report():
+    return await check_indexes()
+
+@api_router.post("/admin/indexes/ensure")
+async def ensure_index_registry():
+    return await ensure_indexes()
+
 # Legacy endpoints for compatibility
 @api_router.get("/")
 async def root():
@@ -1263,6 +2915,8 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # The frontend is cross-origin, so response headers it reads must be exposed
+    expose_headers=["X-Next-Cursor", "ETag", "Age"],
 )
 
 # Configure logging
@@ -1274,4 +2928,10 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in list(background_tasks):
+        task.cancel()
+    try:
+        await asyncio.gather(flush_viewer_sketches(), flush_top_video_sketches(), flush_watched_segments())
+    except Exception as e:
+        logger.error(f"Error flushing analytics sketches: {str(e)}")
     client.close()
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Probabilistic sketches for streaming analytics
+
+Each sketch has a fixed, small memory footprint, is updated one value at a time from
+the progress write path and can be merged with other sketches of the same kind, so
+per-bucket sketches can be combined into any time range.
+"""
+
+import hashlib
+import math
+from typing import Iterable, Dict, List, Tuple, Any
+
+import numpy as np
+
+
+def hash64(value: str) -> int:
+    """Stable 64-bit hash; Python's hash() is salted per process and can't be persisted"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Distinct-count estimate with 2**precision one-byte registers (4 KB and ~1.6% error at 12)"""
+
+    def __init__(self, precision: int = 12, registers: bytes = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = np.zeros(self.size, dtype=np.uint8)
+        if registers is not None:
+            self.registers[:] = np.frombuffer(registers, dtype=np.uint8)
+
+    def add(self, value: str):
+        h = hash64(value)
+        index = h >> (64 - self.precision)
+        remainder = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union in place: the register-wise max of two sketches estimates the union of their sets"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(precision=int(math.log2(len(data))), registers=data)
+
+
+class SpaceSaving:
+    """Heavy hitters with at most `capacity` counters; counts overestimate by at most `error`"""
+
+    def __init__(self, capacity: int = 100, counters: Dict[str, List[int]] = None):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = counters or {}
+
+    def add(self, item: str, weight: int = 1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Replace the smallest counter; its count becomes the newcomer's error bound
+            smallest = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(smallest)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Sum both summaries' counters and keep the largest `capacity` of them"""
+        for item, (count, error) in other.counters.items():
+            counter = self.counters.setdefault(item, [0, 0])
+            counter[0] += count
+            counter[1] += error
+        if len(self.counters) > self.capacity:
+            kept = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))[:self.capacity]
+            self.counters = dict(kept)
+        return self
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """(item, count, error) for the k largest counters, ties broken by item"""
+        ranked = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))[:k]
+        return [(item, count, error) for item, (count, error) in ranked]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [{"item": item, "count": count, "error": error} for item, (count, error) in self.counters.items()]
+
+    @classmethod
+    def from_list(cls, entries: List[Dict[str, Any]], capacity: int = 100) -> "SpaceSaving":
+        return cls(capacity, {entry["item"]: [entry["count"], entry["error"]] for entry in entries})
+
+
+class DDSketch:
+    """Quantiles with bounded relative error; values can also be removed, so a changing value is moved between buckets"""
+
+    ZERO_KEY = "z"
+
+    def __init__(self, relative_accuracy: float = 0.01, counts: Dict[str, int] = None):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts: Dict[str, int] = dict(counts or {})
+
+    def key(self, value: float) -> str:
+        """Bucket key as a string, so it can be used directly as a MongoDB field name"""
+        if value <= 0:
+            return self.ZERO_KEY
+        return str(math.ceil(math.log(value) / self.log_gamma))
+
+    def add(self, value: float, weight: int = 1):
+        key = self.key(value)
+        count = self.counts.get(key, 0) + weight
+        if count:
+            self.counts[key] = count
+        else:
+            self.counts.pop(key, None)
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile q in [0, 1], within the relative accuracy; 0 for an empty sketch"""
+        buckets = sorted(
+            ((float("-inf") if key == self.ZERO_KEY else int(key), count) for key, count in self.counts.items() if count > 0),
+            key=lambda bucket: bucket[0]
+        )
+        total = sum(count for _, count in buckets)
+        if not total:
+            return 0.0
+        rank = q * (total - 1)
+        seen = 0
+        for index, count in buckets:
+            seen += count
+            if seen > rank:
+                return 0.0 if index == float("-inf") else 2 * self.gamma ** index / (self.gamma + 1)
+        return 0.0
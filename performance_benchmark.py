@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmark Suite
+Measures endpoint latency percentiles so changes can be compared before and after deploying
+
+Usage:
+    python performance_benchmark.py [base_url] [user_email]
+"""
+
+import requests
+import sys
+import time
+import statistics
+
+
+class PerformanceBenchmark:
+    def __init__(self, base_url="https://proptech-videos.preview.emergentagent.com/api", runs=50, warmup=5):
+        self.base_url = base_url
+        self.runs = runs
+        self.warmup = warmup
+        self.results = {}
+
+    def percentile(self, samples, pct):
+        """Nearest-rank percentile of a list of samples"""
+        ordered = sorted(samples)
+        rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[rank]
+
+    def benchmark_endpoint(self, name, path):
+        """Time repeated GET requests to one endpoint and record p50/p95/p99 in milliseconds"""
+        print(f"\n⏱️  Benchmarking {name} ({path})...")
+        url = f"{self.base_url}{path}"
+
+        for _ in range(self.warmup):
+            requests.get(url, timeout=30)
+
+        samples = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            response = requests.get(url, timeout=30)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                print(f"❌ {name} returned {response.status_code}")
+                return None
+
+        result = {
+            "p50": self.percentile(samples, 50),
+            "p95": self.percentile(samples, 95),
+            "p99": self.percentile(samples, 99),
+            "mean": statistics.mean(samples),
+        }
+        self.results[name] = result
+        print(f"✅ {name}: p50={result['p50']:.1f}ms p95={result['p95']:.1f}ms "
+              f"p99={result['p99']:.1f}ms mean={result['mean']:.1f}ms")
+        return result
+
+    def benchmark_dashboard(self, user_email):
+        return self.benchmark_endpoint("dashboard", f"/dashboard/{user_email}")
+
+    def print_summary(self):
+        print("\n" + "=" * 60)
+        print("📊 BENCHMARK SUMMARY")
+        print("=" * 60)
+        for name, result in self.results.items():
+            print(f"{name:<30} p95 {result['p95']:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "https://proptech-videos.preview.emergentagent.com/api"
+    user_email = sys.argv[2] if len(sys.argv) > 2 else "unbrokerage@realtyonegroupmexico.mx"
+
+    benchmark = PerformanceBenchmark(base_url)
+    benchmark.benchmark_dashboard(user_email)
+    benchmark.benchmark_endpoint("admin analytics", "/admin/analytics/categories")
+    benchmark.print_summary()